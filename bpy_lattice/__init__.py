@@ -1,4 +1,40 @@
+import importlib
+
 try:
     from ._version import __version__
 except ImportError:
     __version__ = "0.0.0"
+
+# Submodules are loaded on first attribute access, so that importing the
+# package (e.g. for the bmad-to-blender CLI) does not import bpy.
+_SUBMODULES = (
+    "bounds",
+    "cache",
+    "camera",
+    "catalogue",
+    "constants",
+    "elements",
+    "export",
+    "geometry",
+    "interfaces",
+    "lattice",
+    "materials",
+    "mesh",
+    "orbit",
+    "profiling",
+    "render",
+    "slicer",
+    "style",
+    "synthetic",
+    "worker",
+)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
@@ -0,0 +1,167 @@
+"""
+Bounds of a lattice, for framing cameras.
+
+Element extents are computed once as arrays, in the Blender frame of
+lattice.ele_objects. Bounds of the whole lattice, of named elements or of an
+index range are then reductions over these arrays:
+
+    bounds = LatticeBounds(eles, origin=origin)
+    lo, hi = bounds.aabb()
+    lo, hi = bounds.aabb(bounds.select(names="Q*"))
+    center, axes, half = bounds.obb(bounds.select(start=10, end=50))
+"""
+
+import fnmatch
+from typing import Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from . import geometry
+from .elements import Pipe, SBend
+from .style import DEFAULT_STYLE, Style
+
+# Corners of the unit cube
+_CORNERS = np.array(
+    [[i, j, k] for i in (-1, 1) for j in (-1, 1) for k in (-1, 1)], dtype=float
+)
+
+
+class LatticeBounds:
+    """
+    Per-element world-space bounding boxes.
+
+    Parameters
+    ----------
+    eles: list of Element
+        Elements as drawn, see geometry.drawn_elements
+    origin: tuple
+        As in lattice.ele_objects
+    style: Style
+        Sets the transverse size of elements
+
+    Attributes
+    ----------
+    names: np.ndarray of str
+    index: np.ndarray of int
+        Element index (ix_ele)
+    centers: np.ndarray of shape (n, 3)
+    lo, hi: np.ndarray of shape (n, 3)
+        Axis-aligned box of each element
+    """
+
+    def __init__(
+        self,
+        eles,
+        origin: Tuple[float, float, float] = (0, 0, 0),
+        style: Style = DEFAULT_STYLE,
+    ):
+        eles = list(geometry.drawn_elements(eles))
+        n = len(eles)
+        self.names = np.array([ele.name for ele in eles], dtype=str)
+        self.index = np.fromiter((ele.index for ele in eles), int, n)
+        matrices = geometry.ele_matrices(eles, origin=origin)
+        self.centers = matrices[:, :3, 3]
+
+        table = style.resolve(ele.key for ele in eles)
+        transverse = table.scale[table.indices(eles)]
+        for i, ele in enumerate(eles):
+            if isinstance(ele, Pipe) and ele.radius_x and ele.radius_y:
+                transverse[i] = max(ele.radius_x, ele.radius_y) + ele.thickness
+            elif isinstance(ele, SBend):
+                transverse[i] += abs(ele.L * ele.angle) / 8  # Sagitta
+        L = np.fromiter((ele.L for ele in eles), float, n)
+        local = np.column_stack([L / 2, transverse, transverse])
+        # Half extents of the rotated local box
+        half = np.einsum("nij,nj->ni", np.abs(matrices[:, :3, :3]), local)
+        self.lo = self.centers - half
+        self.hi = self.centers + half
+
+    def __len__(self):
+        return len(self.names)
+
+    def select(
+        self,
+        names: Optional[Union[str, Iterable[str]]] = None,
+        start: Optional[Union[int, str]] = None,
+        end: Optional[Union[int, str]] = None,
+    ) -> np.ndarray:
+        """
+        Boolean mask of elements.
+
+        Parameters
+        ----------
+        names: str or list of str, optional
+            Glob pattern (e.g. "Q*") or list of element names
+        start, end: int or str, optional
+            Inclusive range of element index, or of element names
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if names is not None:
+            if isinstance(names, str):
+                mask &= np.array([fnmatch.fnmatchcase(n, names) for n in self.names])
+            else:
+                mask &= np.isin(self.names, list(names))
+        if start is not None:
+            mask &= self.index >= self._index_of(start)
+        if end is not None:
+            mask &= self.index <= self._index_of(end)
+        return mask
+
+    def _index_of(self, ele):
+        if isinstance(ele, str):
+            found = np.flatnonzero(self.names == ele)
+            if not len(found):
+                raise ValueError(f"No element named {ele!r}")
+            return self.index[found[0]]
+        return ele
+
+    def _which(self, which):
+        if which is None:
+            return slice(None)
+        if isinstance(which, np.ndarray) and which.dtype == bool and not which.any():
+            raise ValueError("No elements selected")
+        return which
+
+    def aabb(self, which=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Axis-aligned bounds (lo, hi) of the selected elements.
+
+        which: mask or indices, see select. Default: all elements
+        """
+        which = self._which(which)
+        return self.lo[which].min(axis=0), self.hi[which].max(axis=0)
+
+    def corners(self, which=None) -> np.ndarray:
+        """
+        Corners of the element boxes, of shape (n * 8, 3)
+        """
+        which = self._which(which)
+        lo, hi = self.lo[which], self.hi[which]
+        mid, half = (lo + hi) / 2, (hi - lo) / 2
+        return (mid[:, None, :] + half[:, None, :] * _CORNERS).reshape(-1, 3)
+
+    def obb(self, which=None):
+        """
+        Oriented bounds of the selected elements, with axes from the
+        principal components of the element centers.
+
+        Returns
+        -------
+        center: np.ndarray of shape (3,)
+        axes: np.ndarray of shape (3, 3)
+            Unit axes as rows, longest first
+        half: np.ndarray of shape (3,)
+            Half extents along the axes
+        """
+        which = self._which(which)
+        centers = self.centers[which]
+        mean = centers.mean(axis=0)
+        if len(centers) > 1:
+            _, _, axes = np.linalg.svd(centers - mean)
+        else:
+            axes = np.eye(3)
+        if np.linalg.det(axes) < 0:
+            axes[2] *= -1
+        p = self.corners(which) @ axes.T
+        lo, hi = p.min(axis=0), p.max(axis=0)
+        return ((lo + hi) / 2) @ axes, axes, (hi - lo) / 2
@@ -0,0 +1,238 @@
+"""
+On-disk cache of generated element mesh arrays.
+
+Entries are keyed by everything that determines the geometry (see
+geometry.geometry_key), so repeated builds of the same lattice with the
+same scale settings skip section generation. All entries for the current
+geometry.RESOLUTION are kept in one bundle file: the arrays of every entry
+concatenated, with a table of offsets. The bundle is read once, when the
+first entry is looked up, and new entries are written back in one step by
+save. Reading one file per entry is slower than generating the arrays.
+
+The bundle is capped in size, keeping the most recently used entries.
+
+Example
+-------
+    cache = MeshCache()  # ~/.cache/bpy_lattice/meshes, or $BPY_LATTICE_CACHE
+    objects = lattice.ele_objects(eles, mesh_cache=cache)  # Saves the cache
+
+See scripts/bench_mesh_cache.py for timings against geometry.ele_arrays.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+
+from . import geometry
+
+logger = logging.getLogger(__name__)
+
+# Bump when mesh generation changes, to invalidate old entries
+CACHE_VERSION = 4
+
+ARRAYS = ("verts", "loop_vertices", "loop_totals")
+
+
+def default_cache_dir():
+    return os.environ.get(
+        "BPY_LATTICE_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "bpy_lattice", "meshes"),
+    )
+
+
+def _nbytes(arrays) -> int:
+    return sum(a.nbytes for a in arrays)
+
+
+class MeshCache:
+    """
+    LRU cache of mesh arrays (verts, loop_vertices, loop_totals) in a
+    bundle file. Entries stay in memory for the session once read.
+
+    Parameters
+    ----------
+    directory: str, optional
+        Cache directory. Default: default_cache_dir()
+    max_bytes: int
+        Size cap of the arrays in the bundle. Least recently used entries
+        are dropped when it is saved.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: int = 256 * 2**20,
+    ):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Bundle entries: key -> [arrays, last used time]
+        self.entries = None
+        self.total = 0
+        self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        params = (CACHE_VERSION, geometry.RESOLUTION)
+        digest = hashlib.sha256(repr(params).encode()).hexdigest()[:16]
+        self.path = os.path.join(self.directory, f"meshes_{digest}.npz")
+
+    @staticmethod
+    def key(
+        ele, sc: float, cutaway: Optional[str] = None, section: Optional[str] = None
+    ) -> str:
+        """
+        Element geometry parameters, as a string
+        """
+        return repr(geometry.geometry_key(ele, sc, cutaway, section))
+
+    def _read(self) -> dict:
+        """
+        Entries of the bundle file, as views of its concatenated arrays
+        """
+        try:
+            with np.load(self.path) as data:
+                keys = data["keys"]
+                offsets = data["offsets"]
+                used = data["used"]
+                arrays = [data[name] for name in ARRAYS]
+        except (OSError, KeyError, ValueError) as ex:
+            if os.path.exists(self.path):
+                logger.warning("Ignoring mesh cache %s: %s", self.path, ex)
+            return {}
+        entries = {}
+        for i, key in enumerate(keys.tolist()):
+            start, stop = offsets[i], offsets[i + 1]
+            entries[key] = [
+                tuple(a[b:e] for a, b, e in zip(arrays, start, stop)),
+                float(used[i]),
+            ]
+        return entries
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = self._read()
+            self.total = sum(_nbytes(arrays) for arrays, _ in self.entries.values())
+            logger.debug("Mesh cache: %d entries in %s", len(self.entries), self.path)
+
+    def get(self, key: str):
+        """
+        Cached (verts, loop_vertices, loop_totals), or None
+        """
+        self._load()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        # Mark as recently used. Only saved with new entries, so that warm
+        # builds do not rewrite the bundle.
+        entry[1] = time.time()
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, verts, loop_vertices, loop_totals):
+        """
+        Add an entry. It is written to disk by save.
+        """
+        arrays = (verts, loop_vertices, loop_totals)
+        self._load()
+        old = self.entries.get(key)
+        if old is not None:
+            self.total -= _nbytes(old[0])
+        self.entries[key] = [arrays, time.time()]
+        self.total += _nbytes(arrays)
+        self._dirty = True
+
+    def save(self):
+        """
+        Write the bundle atomically, merged with entries saved by other
+        processes since it was read, keeping the most recently used entries
+        that fit in max_bytes.
+        """
+        if not self._dirty:
+            return
+        entries = self._read()
+        for key, (arrays, used) in self.entries.items():
+            if key not in entries or entries[key][1] < used:
+                entries[key] = [arrays, used]
+        keep = []
+        self.total = 0
+        for key, (arrays, used) in sorted(
+            entries.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            if self.total + _nbytes(arrays) > self.max_bytes:
+                break
+            keep.append(key)
+            self.total += _nbytes(arrays)
+        self.entries = {key: entries[key] for key in keep}
+        self._dirty = False
+        if not keep:
+            self._remove()
+            return
+
+        counts = np.array(
+            [[len(a) for a in self.entries[key][0]] for key in keep], dtype=np.int64
+        )
+        offsets = np.zeros((len(keep) + 1, len(ARRAYS)), dtype=np.int64)
+        np.cumsum(counts, axis=0, out=offsets[1:])
+        arrays = {
+            name: np.concatenate([self.entries[key][0][i] for key in keep])
+            for i, name in enumerate(ARRAYS)
+        }
+        # Write atomically, so concurrent builds never read partial files
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                keys=np.array(keep),
+                offsets=offsets,
+                used=np.array([self.entries[key][1] for key in keep]),
+                **arrays,
+            )
+        os.replace(tmp, self.path)
+        logger.debug("Saved %d mesh cache entries to %s", len(keep), self.path)
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        self.entries = {}
+        self.total = 0
+        self._dirty = False
+        self._remove()
+
+    def mesh_arrays(
+        self,
+        ele,
+        sc: float,
+        cutaway: Optional[str] = None,
+        section: Optional[str] = None,
+    ):
+        """
+        Mesh arrays for an element, generated on a miss
+        """
+        key = self.key(ele, sc, cutaway, section)
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = geometry.ele_arrays(ele, sc, cutaway=cutaway, section=section)
+            self.put(key, *arrays)
+        return arrays
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+    def __repr__(self):
+        return (
+            f"MeshCache({self.directory!r}, max_bytes={self.max_bytes}, "
+            f"hits={self.hits}, misses={self.misses})"
+        )
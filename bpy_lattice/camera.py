@@ -1,8 +1,23 @@
 import bpy
-from math import pi, sqrt
+import numpy as np
+from math import atan, atan2, pi, sin, sqrt, tan
 from bpy_lattice import materials
 
 
+def ensure_camera(name="Camera"):
+    """
+    Get the named camera, creating it if needed, and make it the scene camera.
+    """
+    if name in bpy.data.objects:
+        cam = bpy.data.objects[name]
+    else:
+        cam = bpy.data.objects.new(name, bpy.data.cameras.new(name))
+        cam.data.clip_end = 1000
+        bpy.context.scene.collection.objects.link(cam)
+    bpy.context.scene.camera = cam
+    return cam
+
+
 def camera_at(d):
     cam = bpy.data.objects["Camera"]  # bpy.types.Camera
     cam.location.x = 0.0
@@ -25,6 +40,104 @@ def ortho_camera_at(z, scale):
     cam.data.ortho_scale = scale
 
 
+def _aspect():
+    render = bpy.context.scene.render
+    return (render.resolution_x * render.pixel_aspect_x) / (
+        render.resolution_y * render.pixel_aspect_y
+    )
+
+
+def frame_box(lo, hi, view="perspective", margin=1.1, yaw=0.0, name="Camera"):
+    """
+    Place the camera to frame a box, without hand-tuned distances.
+
+    Parameters
+    ----------
+    lo, hi: array of shape (3,)
+        Box corners, in the world frame rotated by yaw about Z
+    view: str
+        "top" for an orthographic view from above, or "perspective" for a
+        view from 45 degrees above, as camera_at
+    margin: float
+        Extra space around the box
+    yaw: float
+        Rotation of the view about Z, e.g. to align a long machine with
+        the image width
+    """
+    cam = ensure_camera(name)
+    lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    center = (lo + hi) / 2
+    size = hi - lo
+    aspect = _aspect()
+    if view == "top":
+        cam.data.type = "ORTHO"
+        # ortho_scale spans the larger image dimension
+        width, height = size[0], size[1]
+        if aspect >= 1:
+            scale = max(width, height * aspect)
+        else:
+            scale = max(height, width / aspect)
+        cam.data.ortho_scale = max(scale * margin, 1e-3)
+        local = np.array([center[0], center[1], hi[2] + max(size) + 1])
+        tilt = 0.0
+    else:
+        cam.data.type = "PERSP"
+        # Fit the bounding sphere in the narrower field of view
+        fov = cam.data.angle
+        if aspect >= 1:
+            fov_min = 2 * atan(tan(fov / 2) / aspect)
+        else:
+            fov_min = 2 * atan(tan(fov / 2) * aspect)
+        radius = max(np.linalg.norm(size) / 2, 1e-3)
+        d = margin * radius / sin(fov_min / 2)
+        local = center + d * np.array([0, -1 / sqrt(2), 1 / sqrt(2)])
+        tilt = pi / 4
+    c, s = np.cos(yaw), np.sin(yaw)
+    cam.location = (c * local[0] - s * local[1], s * local[0] + c * local[1], local[2])
+    cam.rotation_euler = (tilt, 0, yaw)
+    cam.data.clip_end = max(cam.data.clip_end, 2 * float(np.linalg.norm(local)) + 1)
+    return cam
+
+
+def frame_bounds(
+    bounds,
+    view="perspective",
+    names=None,
+    start=None,
+    end=None,
+    oriented=False,
+    margin=1.1,
+    name="Camera",
+):
+    """
+    Frame the whole lattice, a named section or an index range.
+
+    Parameters
+    ----------
+    bounds: bounds.LatticeBounds
+    names, start, end:
+        Element selection, see LatticeBounds.select
+    oriented: bool
+        Turn the view about Z to align the principal axis of the
+        selection with the image width
+    """
+    which = bounds.select(names=names, start=start, end=end)
+    yaw = 0.0
+    if oriented:
+        _, axes, _ = bounds.obb(which)
+        axis = axes[0]
+        if abs(axis[0]) + abs(axis[1]) > 1e-9:
+            yaw = atan2(axis[1], axis[0])
+        # Box in the frame rotated by yaw
+        c, s = np.cos(yaw), np.sin(yaw)
+        rot = np.array([[c, s, 0], [-s, c, 0], [0, 0, 1]])
+        p = bounds.corners(which) @ rot.T
+        lo, hi = p.min(axis=0), p.max(axis=0)
+    else:
+        lo, hi = bounds.aabb(which)
+    return frame_box(lo, hi, view=view, margin=margin, yaw=yaw, name=name)
+
+
 def lamp_energy(energy):
     lamp = bpy.data.objects["Lamp"]
     lamp.location.z = 10
@@ -33,7 +146,7 @@ def lamp_energy(energy):
 
 def lighting(x, y, z):
     bpy.ops.mesh.primitive_plane_add(location=(x, y, z))
-    bpy.context.active_object.data.materials.append(materials.LIGHT_MATERIAL)
+    bpy.context.active_object.data.materials.append(materials.light_material())
 
 
 def sun(strength):
@@ -0,0 +1,349 @@
+"""
+Background prefetch of the 3DMODEL .blend catalogue.
+
+Before a build, all models referenced by the elements are checked for
+existence, and read from disk on a thread pool. With decompress=True,
+compressed files (gzip, or zstd if the `zstandard` package is installed)
+are decompressed into a cache directory, so that Blender loads them without
+decompressing in the middle of the build.
+
+A persistent JSON index records the file size of each model and the names
+of its objects, listed in the pre-build pass, and their vertex counts and
+sizes once they have been loaded.
+
+Blender itself is only used from the main thread: listing the objects of
+new models in start, and loading them in lattice.add_children_from_blend.
+
+Example
+-------
+    with ModelPrefetcher(catalogue) as prefetcher:
+        prefetcher.start(eles)
+        objects = lattice.ele_objects(
+            eles, use_real_model=True, catalogue=catalogue, prefetcher=prefetcher
+        )
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .elements import Element
+
+logger = logging.getLogger(__name__)
+
+# Bump when the index format changes
+INDEX_VERSION = 1
+
+CHUNK_SIZE = 2**20
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def default_model_dir():
+    return os.environ.get(
+        "BPY_LATTICE_MODEL_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "bpy_lattice", "models"),
+    )
+
+
+def referenced_models(eles: Iterable[Element]) -> List[str]:
+    """
+    Sorted .blend file names referenced by 3DMODEL tags
+    """
+    from .lattice import blendfile
+
+    return sorted({f for f in map(blendfile, eles) if f})
+
+
+def compression(path: str) -> Optional[str]:
+    """
+    "gzip", "zstd" or None, from the file magic
+    """
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic == ZSTD_MAGIC:
+        return "zstd"
+    return None
+
+
+def _reader(kind: Optional[str], f):
+    """
+    Decompressing reader of file object f, or None if kind is not supported
+    """
+    if kind == "gzip":
+        return gzip.GzipFile(fileobj=f)
+    if kind == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            # Blender decompresses zstd itself
+            return None
+        return zstandard.ZstdDecompressor().stream_reader(f)
+    return None
+
+
+def _stamp(path: str) -> dict:
+    st = os.stat(path)
+    return {"mtime_ns": st.st_mtime_ns, "bytes": st.st_size}
+
+
+class ModelPrefetcher:
+    """
+    Prepares the .blend models of a catalogue on a thread pool.
+
+    Parameters
+    ----------
+    catalogue: str
+        Directory of 3DMODEL .blend files
+    directory: str, optional
+        Directory of decompressed models and of index.json.
+        Default: default_model_dir()
+    max_workers: int
+        Threads reading and decompressing files
+    decompress: bool
+        Decompress compressed models into directory. Relative paths in the
+        models (e.g. //textures) then resolve against the cache directory,
+        so this is only for models without external files. Default: False,
+        models are read in place, and Blender decompresses them.
+    """
+
+    def __init__(
+        self,
+        catalogue: str,
+        directory: Optional[str] = None,
+        max_workers: int = 4,
+        decompress: bool = False,
+    ):
+        self.catalogue = catalogue
+        self.directory = directory or default_model_dir()
+        self.decompress = decompress
+        self.missing = []
+        self.futures: Dict[str, Future] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bpy_lattice_models"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.index = self._read_index()
+        self._dirty = False
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get("version") != INDEX_VERSION:
+            return {}
+        return index.get("models", {})
+
+    def save(self):
+        """
+        Write the index atomically
+        """
+        if not self._dirty:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": INDEX_VERSION, "models": self.index}, f, indent=1)
+        os.replace(tmp, self.index_path)
+        self._dirty = False
+
+    def start(self, eles: Iterable[Element]) -> List[str]:
+        """
+        Pre-build pass: check the models referenced by eles, prepare those
+        that exist on the thread pool, and index their objects.
+        Missing models are warned about here, once.
+
+        Returns
+        -------
+        bfiles: list of str
+            Model file names prepared
+        """
+        bfiles = self.prefetch(referenced_models(eles))
+        logger.info("Prefetching %d models, %d missing", len(bfiles), len(self.missing))
+        self.index_models(bfiles)
+        return bfiles
+
+    def index_models(self, bfiles: Iterable[str]):
+        """
+        List the objects of models that are new or changed since they were
+        last indexed, as they become ready, while the others are still being
+        read. Models indexed already are not waited for here, see path.
+        """
+        import bpy
+
+        bfiles = [bfile for bfile in bfiles if bfile not in self.missing]
+        self.prefetch(bfiles)
+        pending = {
+            self.futures[bfile]: bfile for bfile in bfiles if not self._indexed(bfile)
+        }
+        for future in as_completed(pending):
+            bfile = pending[future]
+            path = self.path(bfile)
+            entry = self.index[self._key(bfile)]
+            if "objects" in entry:
+                continue
+            with bpy.data.libraries.load(path) as (data_from, _):
+                entry["objects"] = {name: {} for name in data_from.objects}
+            self._dirty = True
+
+    def _indexed(self, bfile: str) -> bool:
+        """
+        Whether the objects of a model are indexed for its current file
+        """
+        entry = self.index.get(self._key(bfile), {})
+        if "objects" not in entry:
+            return False
+        try:
+            stamp = _stamp(os.path.join(self.catalogue, bfile))
+        except OSError:
+            return False
+        return (entry.get("mtime_ns"), entry.get("bytes")) == (
+            stamp["mtime_ns"],
+            stamp["bytes"],
+        )
+
+    def prefetch(self, bfiles: Iterable[str]) -> List[str]:
+        """
+        Start preparing model files by name, see start
+        """
+        started = []
+        for bfile in bfiles:
+            if bfile in self.futures or bfile in self.missing:
+                continue
+            path = os.path.join(self.catalogue, bfile)
+            if not os.path.isfile(path):
+                logger.warning("Blend file missing: %s", path)
+                self.missing.append(bfile)
+                continue
+            self.futures[bfile] = self.executor.submit(self._prepare, path)
+            started.append(bfile)
+        return started
+
+    def _key(self, bfile: str) -> str:
+        return os.path.abspath(os.path.join(self.catalogue, bfile))
+
+    def _cached_path(self, path: str, stamp: dict) -> str:
+        params = (os.path.abspath(path), stamp["mtime_ns"], stamp["bytes"])
+        digest = hashlib.sha256(repr(params).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}_{os.path.basename(path)}")
+
+    def _prepare(self, path: str) -> dict:
+        """
+        Runs on the thread pool: read or decompress path.
+
+        Returns
+        -------
+        entry: dict
+            Index entry, with `path` the file to load
+        """
+        entry = {**_stamp(path), "compression": compression(path), "path": path}
+        out = self._cached_path(path, entry)
+        if self.decompress and os.path.isfile(out):
+            entry["path"] = out
+            return entry
+
+        with open(path, "rb") as f:
+            reader = _reader(entry["compression"], f) if self.decompress else None
+            if reader is None:
+                # Read through, so that Blender finds the file in the OS cache
+                while f.read(CHUNK_SIZE):
+                    pass
+                return entry
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with open(path, "rb") as f, os.fdopen(fd, "wb") as g:
+                shutil.copyfileobj(_reader(entry["compression"], f), g, CHUNK_SIZE)
+        except (OSError, EOFError) as ex:
+            logger.warning("Could not decompress %s: %s", path, ex)
+            os.remove(tmp)
+            return entry
+        os.replace(tmp, out)
+        entry["path"] = out
+        logger.debug("Decompressed %s to %s", path, out)
+        return entry
+
+    def path(self, bfile: str) -> Optional[str]:
+        """
+        Path to load for a model file name, waiting for it to be prepared.
+        None if the model is missing.
+        """
+        if bfile in self.missing:
+            return None
+        if bfile not in self.futures:
+            self.prefetch([bfile])
+            return self.path(bfile)
+        entry = self.futures[bfile].result()
+        key = self._key(bfile)
+        old = self.index.get(key, {})
+        if (old.get("mtime_ns"), old.get("bytes")) == (
+            entry["mtime_ns"],
+            entry["bytes"],
+        ):
+            entry = {**old, **entry}
+        if entry != old:
+            self.index[key] = entry
+            self._dirty = True
+        return entry["path"]
+
+    def objects(self, bfile: str) -> Optional[dict]:
+        """
+        Indexed objects of a model: name -> {type, vertices, size}, with
+        empty values until the model has been loaded once.
+        None if the model has not been indexed since it last changed.
+        """
+        return self.index.get(self._key(bfile), {}).get("objects")
+
+    def record(self, bfile: str, objects):
+        """
+        Index the vertex counts and sizes of the objects loaded from a
+        model. Objects are in the order of the file, see index_models
+        (Blender may have renamed the loaded objects).
+        """
+        entry = self.index.get(self._key(bfile))
+        if entry is None:
+            return
+        if "objects" not in entry:
+            self.index_models([bfile])
+        info = entry["objects"]
+        if all(info.values()):
+            return
+        for name, ob in zip(info, objects):
+            item = {"type": ob.type, "vertices": 0, "size": [0.0, 0.0, 0.0]}
+            if ob.type == "MESH" and len(ob.data.vertices):
+                co = np.empty(len(ob.data.vertices) * 3)
+                ob.data.vertices.foreach_get("co", co)
+                co = co.reshape(-1, 3) * np.array(ob.scale)
+                item["vertices"] = len(co)
+                item["size"] = np.ptp(co, axis=0).tolist()
+            info[name] = item
+        self._dirty = True
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return (
+            f"ModelPrefetcher({self.catalogue!r}, directory={self.directory!r}, "
+            f"models={len(self.futures)}, missing={len(self.missing)})"
+        )
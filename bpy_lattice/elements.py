@@ -1,5 +1,8 @@
-from dataclasses import dataclass
-from typing import Union
+import re
+from dataclasses import dataclass, replace
+from itertools import product
+from math import floor, pi, remainder
+from typing import Iterable, List, Union
 
 
 @dataclass
@@ -15,6 +18,7 @@ class Element:
     key: str = "MARKER"
     L: float = 0
     descrip: str = ""
+    passes: int = 1  # Number of passes through this element, see dedupe_elements
 
 
 @dataclass
@@ -37,41 +41,127 @@ class Wiggler(Element):
     radius_y: float = 0
 
 
-def map_table_element(line: str) -> Union[SBend, Pipe, Wiggler, Element]:
-    """Maps a comma-separated line to the appropriate beamline element dataclass."""
-    vals = line.split(",")[0:14]
-
+def element_from_values(
+    name,
+    index,
+    x,
+    y,
+    z,
+    theta,
+    phi,
+    psi,
+    key,
+    L,
+    custom1,
+    custom2,
+    custom3,
+    descrip,
+    passes=1,
+) -> Union[SBend, Pipe, Wiggler, Element]:
+    """Makes the appropriate beamline element dataclass from the table values."""
     # Common parameters for all elements
     base_params = {
-        "name": vals[0].strip(),
-        "index": int(vals[1]),
-        "x": float(vals[2]),
-        "y": float(vals[3]),
-        "z": float(vals[4]),
-        "theta": float(vals[5]),
-        "phi": float(vals[6]),
-        "psi": float(vals[7]),
-        "key": vals[8].strip().upper(),
-        "L": float(vals[9]),
-        "descrip": vals[13],
+        "name": str(name).strip(),
+        "index": int(index),
+        "x": float(x),
+        "y": float(y),
+        "z": float(z),
+        "theta": float(theta),
+        "phi": float(phi),
+        "psi": float(psi),
+        "key": str(key).strip().upper(),
+        "L": float(L),
+        "descrip": str(descrip).strip(),
+        "passes": int(passes),
     }
 
     element_type = base_params["key"]
 
     if element_type == "SBEND":
         return SBend(
-            **base_params, angle=float(vals[10]), e1=float(vals[11]), e2=float(vals[12])
+            **base_params, angle=float(custom1), e1=float(custom2), e2=float(custom3)
         )
     elif element_type == "PIPE":
         return Pipe(
             **base_params,
-            radius_x=float(vals[10]),
-            radius_y=float(vals[11]),
-            thickness=float(vals[12]),
+            radius_x=float(custom1),
+            radius_y=float(custom2),
+            thickness=float(custom3),
         )
     elif element_type == "WIGGLER":
-        return Wiggler(
-            **base_params, radius_x=float(vals[10]), radius_y=float(vals[11])
-        )
+        return Wiggler(**base_params, radius_x=float(custom1), radius_y=float(custom2))
     else:
         return Element(**base_params)
+
+
+def map_table_element(line: str) -> Union[SBend, Pipe, Wiggler, Element]:
+    """
+    Maps a comma-separated line to the appropriate beamline element dataclass.
+
+    An optional 15th column is the number of passes, see dedupe_elements.
+    """
+    vals = line.split(",")
+    passes = vals[14].strip() if len(vals) > 14 else ""
+    return element_from_values(
+        *vals[0:14], passes=int(passes) if passes.isdigit() else 1
+    )
+
+
+# Multipass slaves are named after their lord with a pass suffix: Q1\1, Q1\2
+MULTIPASS_SUFFIX = re.compile(r"\\\d+$")
+
+
+def base_name(name: str) -> str:
+    """Element name without a multipass suffix."""
+    return MULTIPASS_SUFFIX.sub("", name)
+
+
+def _same_place(a: Element, b: Element, tol: float) -> bool:
+    """True if a and b have the same length, position and orientation."""
+    for f in ("L", "x", "y", "z"):
+        if abs(getattr(a, f) - getattr(b, f)) > tol:
+            return False
+    for f in ("theta", "phi", "psi"):
+        # Difference wrapped into [-pi, pi]
+        if abs(remainder(getattr(a, f) - getattr(b, f), 2 * pi)) > tol:
+            return False
+    return True
+
+
+def dedupe_elements(eles: Iterable[Element], tol: float = 1e-6) -> List[Element]:
+    """
+    Merge repeated passes through the same physical element.
+
+    In multipass lattices, each pass of a lord can appear in the table
+    (e.g. Q1\\1, Q1\\2) with the same floor position. Elements are the same
+    if they have the same base name and key, and their length, position
+    and orientation differ by at most tol. Angles are compared modulo 2 pi.
+    The first of each is kept, under its base name, with passes the total
+    number of passes.
+
+    The input elements are not modified.
+    """
+    kept = []
+    # Kept elements by base name, key and position on a grid of spacing
+    # tol, so candidates are only searched in neighboring cells
+    cells = {}
+    for ele in eles:
+        name = base_name(ele.name)
+        cell = tuple(floor(v / tol) for v in (ele.x, ele.y, ele.z))
+        match = None
+        for offset in product((-1, 0, 1), repeat=3):
+            near = tuple(c + o for c, o in zip(cell, offset))
+            for i in cells.get((name, ele.key, near), ()):
+                if _same_place(kept[i], ele, tol):
+                    match = i
+                    break
+            if match is not None:
+                break
+        if match is None:
+            cells.setdefault((name, ele.key, cell), []).append(len(kept))
+            kept.append(ele)
+        else:
+            kept[match] = replace(
+                kept[match], name=name, passes=kept[match].passes + ele.passes
+            )
+    return kept
@@ -0,0 +1,437 @@
+"""
+Export lattice geometry directly to glTF (.glb), PLY or OBJ, without Blender.
+
+Meshes are generated with the same section definitions as the Blender
+meshes (see geometry). Elements with identical shape share a single glTF
+mesh, instanced by one node per element. Geometry is streamed to disk
+element by element.
+
+Example
+-------
+    bpy-lattice-export lat.layout_table lat.glb
+"""
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import tempfile
+from typing import Optional, Tuple
+
+import numpy as np
+
+from . import geometry
+from .elements import dedupe_elements, map_table_element
+from .style import DEFAULT_STYLE, Style
+
+# Blender/Bmad drawing frame (Z up) to glTF/OBJ frame (Y up)
+Z_UP_TO_Y_UP = np.array(
+    [
+        [1, 0, 0, 0],
+        [0, 0, 1, 0],
+        [0, -1, 0, 0],
+        [0, 0, 0, 1],
+    ],
+    dtype=float,
+)
+
+
+def read_layout_table(file):
+    """
+    Read a .layout_table file into a list of elements.
+
+    Same as lattice.import_lattice, which requires bpy.
+    """
+    with open(file, "r") as f:
+        next(f)  # Skip the header line
+        return [map_table_element(line) for line in f]
+
+
+def _fan_apex(poly):
+    """
+    Index of the vertex with the largest interior angle. Fanning from it
+    triangulates convex sections and the star-shaped cutaway sections.
+    """
+    prev = poly - np.roll(poly, 1, axis=0)
+    nxt = np.roll(poly, -1, axis=0) - poly
+    normal = np.cross(poly, np.roll(poly, -1, axis=0)).sum(axis=0)
+    turn = np.arctan2(np.cross(prev, nxt) @ normal, (prev * nxt).sum(axis=1))
+    return int(np.argmin(turn))
+
+
+def triangulate(verts, faces):
+    """
+    Triangle fan of each face.
+
+    Returns
+    -------
+    tris: np.ndarray of shape (n_triangles, 3)
+    """
+    tris = []
+    for face in faces:
+        face = list(face)
+        if len(face) > 4:
+            k = _fan_apex(verts[face])
+            face = face[k:] + face[:k]
+        for i in range(1, len(face) - 1):
+            tris.append((face[0], face[i], face[i + 1]))
+    return np.array(tris, dtype=np.uint32).reshape(-1, 3)
+
+
+class _Shapes:
+    """
+    Generated geometry, keyed by geometry.geometry_key
+    """
+
+    def __init__(self, style, cutaway, eles):
+        self.table = style.resolve(ele.key for ele in eles)
+        self.cutaway = cutaway
+        self.shapes = {}
+
+    def key(self, ele):
+        sc, _, section = self.table.rows[self.table.index[ele.key]]
+        return geometry.geometry_key(ele, sc, self.cutaway, section), sc, section
+
+    def color(self, ele):
+        return self.table.rows[self.table.index[ele.key]].color
+
+    def get(self, ele):
+        key, sc, section = self.key(ele)
+        if key not in self.shapes:
+            self.shapes[key] = geometry.ele_geometry(
+                ele, sc, cutaway=self.cutaway, section=section
+            )
+        return key, self.shapes[key]
+
+
+def _pad4(f, n, fill=b"\0"):
+    """
+    Pad a stream at position n to a multiple of 4 bytes. Returns the new length.
+    """
+    pad = (-n) % 4
+    f.write(fill * pad)
+    return n + pad
+
+
+def write_gltf(
+    eles,
+    file: str,
+    origin: Tuple[float, float, float] = (0, 0, 0),
+    cutaway: Optional[str] = None,
+    style: Style = DEFAULT_STYLE,
+):
+    """
+    Write a binary glTF (.glb) file.
+
+    Each distinct element shape becomes one mesh, and each element
+    a node that instances it.
+    """
+    drawn = list(geometry.drawn_elements(eles))
+    shapes = _Shapes(style, cutaway, drawn)
+    materials, material_index = [], {}
+    meshes, mesh_index = [], {}
+    accessors, buffer_views, nodes = [], [], []
+
+    def add_view(f, offset, data, target):
+        data = np.ascontiguousarray(data)
+        f.write(data.tobytes())
+        buffer_views.append(
+            {
+                "buffer": 0,
+                "byteOffset": offset,
+                "byteLength": data.nbytes,
+                "target": target,
+            }
+        )
+        return _pad4(f, offset + data.nbytes)
+
+    folder = os.path.dirname(os.path.abspath(file))
+    with tempfile.TemporaryFile(dir=folder) as binf:
+        offset = 0
+        matrices = geometry.ele_matrices(drawn, origin)
+        for ele, m in zip(drawn, matrices):
+            key, (verts, faces) = shapes.get(ele)
+            if key not in mesh_index:
+                if ele.key not in material_index:
+                    material_index[ele.key] = len(materials)
+                    color = shapes.color(ele)
+                    materials.append(
+                        {
+                            "name": ele.key + "_material",
+                            "pbrMetallicRoughness": {
+                                "baseColorFactor": [*map(float, color), 1.0],
+                                "metallicFactor": 0.0,
+                                "roughnessFactor": 0.8,
+                            },
+                        }
+                    )
+                pos = verts.astype(np.float32)
+                tris = triangulate(verts, faces)
+                offset = add_view(binf, offset, pos, 34962)  # ARRAY_BUFFER
+                accessors.append(
+                    {
+                        "bufferView": len(buffer_views) - 1,
+                        "componentType": 5126,  # FLOAT
+                        "count": len(pos),
+                        "type": "VEC3",
+                        "min": pos.min(axis=0).tolist(),
+                        "max": pos.max(axis=0).tolist(),
+                    }
+                )
+                offset = add_view(binf, offset, tris, 34963)  # ELEMENT_ARRAY_BUFFER
+                accessors.append(
+                    {
+                        "bufferView": len(buffer_views) - 1,
+                        "componentType": 5125,  # UNSIGNED_INT
+                        "count": tris.size,
+                        "type": "SCALAR",
+                    }
+                )
+                mesh_index[key] = len(meshes)
+                meshes.append(
+                    {
+                        "name": ele.name,
+                        "primitives": [
+                            {
+                                "attributes": {"POSITION": len(accessors) - 2},
+                                "indices": len(accessors) - 1,
+                                "material": material_index[ele.key],
+                            }
+                        ],
+                    }
+                )
+            node = {
+                "name": ele.name,
+                "mesh": mesh_index[key],
+                "matrix": m.T.ravel().tolist(),  # column-major
+            }
+            if ele.passes > 1:
+                node["extras"] = {"passes": ele.passes}
+            nodes.append(node)
+
+        # Root node converts to the Y-up glTF frame
+        nodes.append(
+            {
+                "name": "lattice",
+                "matrix": Z_UP_TO_Y_UP.T.ravel().tolist(),
+                "children": list(range(len(nodes))),
+            }
+        )
+        gltf = {
+            "asset": {"version": "2.0", "generator": "bpy-lattice"},
+            "scene": 0,
+            "scenes": [{"nodes": [len(nodes) - 1]}],
+            "nodes": nodes,
+            "meshes": meshes,
+            "materials": materials,
+            "accessors": accessors,
+            "bufferViews": buffer_views,
+            "buffers": [{"byteLength": offset}],
+        }
+        json_bytes = json.dumps(gltf, separators=(",", ":")).encode()
+        json_bytes += b" " * ((-len(json_bytes)) % 4)
+
+        with open(file, "wb") as f:
+            total = 12 + 8 + len(json_bytes) + 8 + offset
+            f.write(struct.pack("<III", 0x46546C67, 2, total))  # glTF
+            f.write(struct.pack("<II", len(json_bytes), 0x4E4F534A))  # JSON
+            f.write(json_bytes)
+            f.write(struct.pack("<II", offset, 0x004E4942))  # BIN
+            binf.seek(0)
+            shutil.copyfileobj(binf, f)
+
+    return file
+
+
+def _world(verts, m, y_up):
+    if y_up:
+        m = Z_UP_TO_Y_UP @ m
+    return verts @ m[:3, :3].T + m[:3, 3]
+
+
+def write_obj(
+    eles,
+    file: str,
+    origin: Tuple[float, float, float] = (0, 0, 0),
+    cutaway: Optional[str] = None,
+    style: Style = DEFAULT_STYLE,
+    y_up: bool = True,
+):
+    """
+    Write a Wavefront OBJ file, with one object per element,
+    and a .mtl file with one material per element key.
+    """
+    drawn = list(geometry.drawn_elements(eles))
+    shapes = _Shapes(style, cutaway, drawn)
+    mtlfile = os.path.splitext(file)[0] + ".mtl"
+    keys = {}
+    n_verts = 0
+    with open(file, "w") as f:
+        f.write("# bpy-lattice\n")
+        f.write(f"mtllib {os.path.basename(mtlfile)}\n")
+        matrices = geometry.ele_matrices(drawn, origin)
+        for ele, m in zip(drawn, matrices):
+            _, (verts, faces) = shapes.get(ele)
+            keys.setdefault(ele.key, shapes.color(ele))
+            world = _world(verts, m, y_up)
+            f.write(f"o {ele.name}\nusemtl {ele.key}_material\n")
+            np.savetxt(f, world, fmt="v %.6f %.6f %.6f")
+            for face in faces:
+                f.write("f " + " ".join(str(n_verts + i + 1) for i in face) + "\n")
+            n_verts += len(world)
+
+    with open(mtlfile, "w") as f:
+        for key, color in keys.items():
+            f.write(f"newmtl {key}_material\nKd {color[0]} {color[1]} {color[2]}\n")
+    return file
+
+
+def write_ply(
+    eles,
+    file: str,
+    origin: Tuple[float, float, float] = (0, 0, 0),
+    cutaway: Optional[str] = None,
+    style: Style = DEFAULT_STYLE,
+    y_up: bool = False,
+):
+    """
+    Write a binary PLY file with vertex colors.
+    """
+    drawn = list(geometry.drawn_elements(eles))
+    shapes = _Shapes(style, cutaway, drawn)
+
+    # Vertex and face counts are needed for the header
+    n_verts = n_faces = 0
+    for ele in drawn:
+        _, (verts, faces) = shapes.get(ele)
+        n_verts += len(verts)
+        n_faces += len(faces)
+
+    vdtype = np.dtype(
+        [
+            ("x", "<f4"),
+            ("y", "<f4"),
+            ("z", "<f4"),
+            ("red", "u1"),
+            ("green", "u1"),
+            ("blue", "u1"),
+        ]
+    )
+    header = (
+        "ply\nformat binary_little_endian 1.0\ncomment bpy-lattice\n"
+        f"element vertex {n_verts}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        "property uchar red\nproperty uchar green\nproperty uchar blue\n"
+        f"element face {n_faces}\n"
+        "property list uchar int vertex_indices\nend_header\n"
+    )
+    with open(file, "wb") as f:
+        f.write(header.encode("ascii"))
+        matrices = geometry.ele_matrices(drawn, origin)
+        for ele, m in zip(drawn, matrices):
+            _, (verts, faces) = shapes.get(ele)
+            world = _world(verts, m, y_up)
+            color = np.round(255 * np.array(shapes.color(ele)))
+            data = np.empty(len(world), dtype=vdtype)
+            data["x"], data["y"], data["z"] = world.T
+            data["red"], data["green"], data["blue"] = color
+            f.write(data.tobytes())
+        groups = {}
+        offset = 0
+        for ele in drawn:
+            key, (verts, faces) = shapes.get(ele)
+            if key not in groups:
+                groups[key] = _face_groups(faces)
+            for n, idx in groups[key]:
+                data = np.empty(len(idx), dtype=[("n", "u1"), ("v", "<i4", (n,))])
+                data["n"] = n
+                data["v"] = idx + offset
+                f.write(data.tobytes())
+            offset += len(verts)
+    return file
+
+
+def _face_groups(faces):
+    """
+    Faces grouped by their number of vertices, as (n, array of shape (k, n))
+    """
+    groups = {}
+    for face in faces:
+        face = list(face)
+        groups.setdefault(len(face), []).append(face)
+    return [(n, np.array(g, dtype="<i4")) for n, g in groups.items()]
+
+
+WRITERS = {
+    ".glb": write_gltf,
+    ".obj": write_obj,
+    ".ply": write_ply,
+}
+
+
+def export_lattice(eles, file: str, dedupe: bool = True, **kwargs):
+    """
+    Export elements to a file. The format is chosen by the file extension,
+    see WRITERS.
+
+    With dedupe=True, repeated passes through the same physical element
+    in multipass lattices are written once, see elements.dedupe_elements.
+    glTF nodes of such elements have a "passes" extra.
+    """
+    ext = os.path.splitext(file)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError(f"Unknown export format {ext!r}. Choose from {list(WRITERS)}")
+    if dedupe:
+        eles = dedupe_elements(eles)
+    return WRITERS[ext](eles, file, **kwargs)
+
+
+def export_entrypoint(argv=None):
+    """
+    Entry point for exporting a .layout_table to glTF, OBJ or PLY.
+    """
+    parser = argparse.ArgumentParser(
+        description="Export a .layout_table to .glb, .obj or .ply without Blender."
+    )
+    parser.add_argument("layout_file", help=".layout_table file")
+    parser.add_argument(
+        "outfile",
+        nargs="?",
+        help="Output file (default: layout file with .glb extension)",
+    )
+    parser.add_argument(
+        "--origin",
+        type=float,
+        nargs=3,
+        default=(0, 0, 0),
+        help="Origin subtracted from the (z, x, y) element positions",
+    )
+    parser.add_argument("--cutaway", default=None, choices=list(geometry.CUTAWAY_WEDGE))
+    parser.add_argument(
+        "--scale-factor",
+        type=float,
+        default=DEFAULT_STYLE.scale_factor,
+        help="Overall transverse scale factor",
+    )
+    parser.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="Write every pass of multipass elements",
+    )
+    args = parser.parse_args(argv)
+    outfile = args.outfile or os.path.splitext(args.layout_file)[0] + ".glb"
+    eles = read_layout_table(args.layout_file)
+    export_lattice(
+        eles,
+        outfile,
+        origin=tuple(args.origin),
+        cutaway=args.cutaway,
+        dedupe=not args.no_dedupe,
+        style=DEFAULT_STYLE.replace(scale_factor=args.scale_factor),
+    )
+    print("Wrote: ", outfile)
+
+
+if __name__ == "__main__":
+    export_entrypoint()
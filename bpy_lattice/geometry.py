@@ -0,0 +1,497 @@
+"""
+Element geometry: cross-sections and face lists.
+
+This module does not depend on bpy, so the same section definitions are
+used for building Blender meshes (lattice.ele_mesh) and for exporting
+lattices directly to files (export).
+
+Coordinates are relative to the center of the element, with X along the
+element and (y, z) transverse, as in the Blender objects.
+"""
+
+import dataclasses
+import logging
+from functools import lru_cache
+from math import atan2, cos, pi, sin
+from typing import Optional
+
+import numpy as np
+
+from .elements import Element, Pipe, SBend
+from .style import DEFAULT_STYLE, ELE_SECTION, Style
+
+logger = logging.getLogger(__name__)
+
+# Number of sections along a bend
+N_SBEND_SECTIONS = 20
+
+# Number of points in an elliptical section
+ELLIPSE_POINTS = 30
+
+# Everything above that sets mesh resolution, for cache keys
+RESOLUTION = (("sbend_sections", N_SBEND_SECTIONS), ("ellipse_points", ELLIPSE_POINTS))
+
+
+def ele_x_scale(ele: Element, style: Style = DEFAULT_STYLE):
+    """
+    Scale factor for an element
+    """
+    return style.lookup(ele.key).scale
+
+
+def ele_color(ele: Element, style: Style = DEFAULT_STYLE):
+    """
+    Color for an element
+    """
+    return style.lookup(ele.key).color
+
+
+def section_type(ele: Element, section: Optional[str] = None):
+    """
+    Section type of an element, see style.SECTION_TYPES
+    """
+    return section or ELE_SECTION.get(ele.key, "ellipse")
+
+
+@lru_cache(maxsize=256)
+def strip_topology(n_sections: int, n_points: int, closed: bool = True):
+    """
+    Faces joining n_sections sections of n_points each, as flat loop arrays.
+
+    Faces are wound outward for sections that are counter-clockwise about
+    the direction from one section to the next. The topology depends only
+    on the arguments, so the (read-only) arrays are cached and shared.
+
+    Returns
+    -------
+    loop_vertices: np.ndarray of int32
+        Vertex index of each face corner, face after face
+    loop_totals: np.ndarray of int32
+        Number of corners of each face
+    """
+    n = n_points
+    i = np.arange(n_sections - 1)[:, None] * n
+    j = np.arange(n)[None, :]
+    jn = (j + 1) % n
+    quads = np.stack(
+        np.broadcast_arrays(i + j, i + jn, i + n + jn, i + n + j), axis=-1
+    ).reshape(-1, 4)
+    parts = [quads.ravel()]
+    totals = [np.full(len(quads), 4)]
+    if closed:
+        last = (n_sections - 1) * n
+        parts += [np.arange(n)[::-1], np.arange(last, last + n)]  # First, last
+        totals += [[n, n]]
+    loop_vertices = np.concatenate(parts).astype(np.int32)
+    loop_totals = np.concatenate(totals).astype(np.int32)
+    loop_vertices.flags.writeable = loop_totals.flags.writeable = False
+    return loop_vertices, loop_totals
+
+
+@lru_cache(maxsize=256)
+def strip_faces(n_sections: int, n_points: int, closed: bool = True):
+    """
+    strip_topology as a tuple of vertex index tuples
+    """
+    loop_vertices, loop_totals = strip_topology(n_sections, n_points, closed)
+    split = np.split(loop_vertices.tolist(), np.cumsum(loop_totals)[:-1])
+    return tuple(tuple(f.tolist()) for f in split)
+
+
+def faces_from(sections, closed=True):
+    """
+    A section is a list of vertices that defines a cross-section of an element
+    This makes rectangle faces, see strip_topology.
+    """
+    nix = [len(s) for s in sections]
+    if len(set(nix)) > 1:
+        logger.error("sections must have the same number of points")
+        return
+    return strip_faces(len(sections), nix[0], closed)
+
+
+def box_section(X, haperture, vaperture):
+    return (
+        (X, haperture, vaperture),
+        (X, -haperture, vaperture),
+        (X, -haperture, -vaperture),
+        (X, haperture, -vaperture),
+    )
+
+
+def ellipse_section(X, haperture, vaperture, n=ELLIPSE_POINTS):
+    angles = [2 * pi * i / n for i in range(n)]
+    return [(X, haperture * cos(a), vaperture * sin(a)) for a in angles]
+
+
+def multipole_section(X, aperture, n):
+    angles = [pi * i / n + pi / (2 * n) for i in range(2 * n)]
+    return [(X, aperture * cos(a), aperture * sin(a)) for a in angles]
+
+
+# Angular wedge (in the transverse y-z plane, measured from +y toward +z)
+# removed from each section for a cutaway view
+CUTAWAY_WEDGE = {
+    "half": (0, pi),
+    "quarter": (pi / 2, pi),
+}
+
+
+def _ray_crossing(p, q, a):
+    """
+    Crossing of the 2D segment p->q with the ray from the origin at angle a.
+
+    Returns (t, point, ccw) or None, where t is the segment parameter
+    and ccw is True if the segment crosses in the counter-clockwise sense.
+    """
+    dy, dz = cos(a), sin(a)
+    ey, ez = q[0] - p[0], q[1] - p[1]
+    denom = dy * ez - dz * ey
+    if abs(denom) < 1e-15:
+        return None
+    t = (dz * p[0] - dy * p[1]) / denom
+    # Half-open, so a crossing at a vertex is found on one segment only
+    if t < -1e-12 or t > 1 - 1e-12:
+        return None
+    y, z = p[0] + t * ey, p[1] + t * ez
+    if y * dy + z * dz < 0:
+        return None
+    return t, (y, z), denom > 0
+
+
+def cut_section(section, cutaway=None):
+    """
+    Clip a section polygon analytically for a cutaway view.
+
+    The wedge CUTAWAY_WEDGE[cutaway] is removed from the polygon.
+    Sections must be counter-clockwise in the y-z plane and star-shaped
+    about the origin, which is the case for all sections made here.
+    Since the result depends only on the transverse shape, all sections
+    of an element keep the same number of points.
+    """
+    if not cutaway:
+        return section
+    a0, a1 = CUTAWAY_WEDGE[cutaway]
+    X = section[0][0]
+    pts = [(p[1], p[2]) for p in section]
+
+    def inside(p):
+        a = atan2(p[1], p[0]) % (2 * pi)
+        return a0 + 1e-9 < a < a1 - 1e-9
+
+    out = []
+    n = len(pts)
+    for i in range(n):
+        p, q = pts[i], pts[(i + 1) % n]
+        if not inside(p):
+            out.append(p)
+        hits = []
+        for a, entering in ((a0, True), (a1, False)):
+            hit = _ray_crossing(p, q, a)
+            if hit and hit[2]:
+                hits.append((hit[0], hit[1], entering))
+        for _, point, entering in sorted(hits):
+            out.append(point)
+            if entering:
+                out.append((0.0, 0.0))
+
+    # Remove repeated points, e.g. from crossings at vertices
+    def same(p, q):
+        return abs(p[0] - q[0]) < 1e-12 and abs(p[1] - q[1]) < 1e-12
+
+    clipped = []
+    for p in out:
+        if not any(same(p, q) for q in clipped):
+            clipped.append(p)
+    return [(X, y, z) for y, z in clipped]
+
+
+def ele_section(
+    s_rel,
+    ele: Element,
+    sc: float,
+    cutaway: Optional[str] = None,
+    section: Optional[str] = None,
+):
+    """
+    Make sections relative to center of element
+
+    sc: float
+        Transverse scale of the element, see ele_x_scale
+    cutaway: str, optional
+        Remove a wedge from the section, see CUTAWAY_WEDGE.
+    section: str, optional
+        Section type, see style.SECTION_TYPES. Default: from the element key
+    """
+    section = section_type(ele, section)
+    if section == "bend" and isinstance(ele, SBend):
+        return _sbend_section(s_rel, ele, sc, cutaway)
+    return cut_section(_ele_section(s_rel, ele, sc, section), cutaway)
+
+
+def _sbend_section(s_rel, ele: SBend, sc, cutaway=None):
+    a = ele.angle
+    if abs(a) < 1e-5 or abs(ele.L) < 1e-5:
+        return cut_section(box_section(s_rel, sc, sc), cutaway)
+    L = ele.L
+    rho = L / a
+    # Baseline section
+    s0 = cut_section(box_section(0, sc, sc), cutaway)
+    # Edge angle
+    f = s_rel / L + 0.5
+    edge = ele.e2 * f + (-1) * ele.e1 * (1 - f)
+    # Rotate by the edge angle, then along the arc, about Z
+    ce, se = cos(edge), sin(edge)
+    ca, sa = cos(-s_rel / rho), sin(-s_rel / rho)
+    sec = []
+    for x, y, z in s0:
+        x, y = ce * x - se * y, se * x + ce * y
+        y += rho
+        x, y = ca * x - sa * y, sa * x + ca * y
+        sec.append((x, y - rho, z))
+    return sec
+
+
+def _ele_section(s_rel, ele: Element, sc, section="ellipse"):
+    if section == "quadrupole":
+        return multipole_section(s_rel, sc, 4)
+    elif section == "sextupole":
+        return multipole_section(s_rel, sc, 6)
+    elif section == "wiggler":
+        return box_section(s_rel, sc, 2 * sc)
+    elif section in ("box", "bend"):
+        return box_section(s_rel, sc, sc)
+    elif section == "pipe" and isinstance(ele, Pipe):
+        rx = ele.radius_x
+        ry = ele.radius_y
+        t = ele.thickness
+        if rx == 0 or ry == 0:
+            return ellipse_section(s_rel, sc, sc)
+        else:
+            return ellipse_section(s_rel, rx + t, ry + t)
+    else:
+        return ellipse_section(s_rel, sc, sc)
+
+
+def ele_slist(ele: Element, section: Optional[str] = None):
+    """
+    Positions of the sections along an element, relative to its center
+    """
+    L = ele.L
+    if section_type(ele, section) == "bend":
+        n = N_SBEND_SECTIONS
+        return [L * i / (n - 1) - L / 2 for i in range(n)]
+    return [-L / 2, L / 2]
+
+
+def ele_sections(
+    ele: Element,
+    sc: float,
+    cutaway: Optional[str] = None,
+    section: Optional[str] = None,
+):
+    """
+    All sections along an element
+    """
+    return [
+        ele_section(s_rel, ele, sc, cutaway=cutaway, section=section)
+        for s_rel in ele_slist(ele, section)
+    ]
+
+
+def ele_geometry(
+    ele: Element,
+    sc: float,
+    cutaway: Optional[str] = None,
+    section: Optional[str] = None,
+):
+    """
+    Vertices and faces for an element.
+
+    Returns
+    -------
+    verts: np.ndarray of shape (n_vertices, 3)
+    faces: tuple of vertex index tuples, shared between elements
+    """
+    sections = ele_sections(ele, sc, cutaway=cutaway, section=section)
+    faces = faces_from(sections)
+    verts = np.array(sections, dtype=float).reshape(-1, 3)
+    return verts, faces
+
+
+def ele_arrays(
+    ele: Element,
+    sc: float,
+    cutaway: Optional[str] = None,
+    section: Optional[str] = None,
+):
+    """
+    Vertices and flat loop arrays for an element, see strip_topology.
+
+    Returns
+    -------
+    verts, loop_vertices, loop_totals
+    """
+    sections = ele_sections(ele, sc, cutaway=cutaway, section=section)
+    verts = np.array(sections, dtype=float).reshape(-1, 3)
+    return (verts, *strip_topology(len(sections), len(sections[0])))
+
+
+def element_columns(eles, names=("x", "y", "z", "theta", "phi", "psi", "L")):
+    """
+    Columns of element attributes as arrays
+    """
+    return {
+        name: np.fromiter((getattr(ele, name) for ele in eles), float, len(eles))
+        for name in names
+    }
+
+
+def element_matrices(x, y, z, theta, phi, psi, origin=(0, 0, 0)):
+    """
+    World matrices of elements in the Blender frame from Bmad floor coordinates.
+
+    The Bmad (x, y, z) position maps to Blender (z, x, y), shifted by
+    origin, and the rotation is Euler XYZ (psi, -phi, theta).
+
+    Returns
+    -------
+    matrices: np.ndarray of shape (n, 4, 4)
+    """
+    Xcenter, Ycenter, Zcenter = origin
+    ct, st = np.cos(theta), np.sin(theta)
+    cb, sb = np.cos(-np.asarray(phi)), np.sin(-np.asarray(phi))
+    ca, sa = np.cos(psi), np.sin(psi)
+    n = len(ct)
+    m = np.zeros((n, 4, 4))
+    # Rz(theta) @ Ry(-phi) @ Rx(psi)
+    m[:, 0, 0] = ct * cb
+    m[:, 0, 1] = ct * sb * sa - st * ca
+    m[:, 0, 2] = ct * sb * ca + st * sa
+    m[:, 1, 0] = st * cb
+    m[:, 1, 1] = st * sb * sa + ct * ca
+    m[:, 1, 2] = st * sb * ca - ct * sa
+    m[:, 2, 0] = -sb
+    m[:, 2, 1] = cb * sa
+    m[:, 2, 2] = cb * ca
+    m[:, 0, 3] = np.asarray(z) - Xcenter
+    m[:, 1, 3] = np.asarray(x) - Ycenter
+    m[:, 2, 3] = np.asarray(y) - Zcenter
+    m[:, 3, 3] = 1
+    return m
+
+
+def ele_matrices(eles, origin=(0, 0, 0)):
+    """
+    World matrices for a list of elements, see element_matrices
+    """
+    c = element_columns(eles, names=("x", "y", "z", "theta", "phi", "psi"))
+    return element_matrices(**c, origin=origin)
+
+
+def face_normals(verts, loop_vertices, loop_totals):
+    """
+    Unit normals of polygons given as flat loop arrays (Newell's method)
+    """
+    verts = np.asarray(verts, dtype=float)
+    loop_starts = np.cumsum(loop_totals) - loop_totals
+    # Next corner of each loop within its face
+    face = np.repeat(np.arange(len(loop_totals)), loop_totals)
+    corner = np.arange(len(loop_vertices)) - loop_starts[face]
+    nxt = loop_starts[face] + (corner + 1) % loop_totals[face]
+    p = verts[loop_vertices]
+    q = verts[loop_vertices[nxt]]
+    terms = np.cross(p, q)
+    normals = np.zeros((len(loop_totals), 3))
+    np.add.at(normals, face, terms)
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(norm > 0, norm, 1)
+
+
+def loop_normals(verts, loop_vertices, loop_totals, sharp_angle=pi / 6):
+    """
+    Custom split normals, one per loop.
+
+    Each loop gets the average normal of the faces around its vertex that
+    are within sharp_angle of its own face, so curved sides are smooth
+    while caps and corners of boxes and multipoles stay sharp.
+
+    Returns
+    -------
+    normals: np.ndarray of shape (n_loops, 3)
+    """
+    fn = face_normals(verts, loop_vertices, loop_totals)
+    face = np.repeat(np.arange(len(loop_totals)), loop_totals)
+
+    # Faces around each vertex, padded with -1
+    order = np.argsort(loop_vertices, kind="stable")
+    counts = np.bincount(loop_vertices, minlength=len(verts))
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(len(order)) - starts[loop_vertices[order]]
+    ring = np.full((len(verts), max(counts.max(initial=0), 1)), -1)
+    ring[loop_vertices[order], rank] = face[order]
+
+    around = ring[loop_vertices]  # (n_loops, valence)
+    nb = fn[around]
+    own = fn[face][:, None, :]
+    keep = (around >= 0) & ((nb * own).sum(axis=2) >= np.cos(sharp_angle) - 1e-9)
+    normals = (nb * keep[..., None]).sum(axis=1)
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+
+# Element fields that do not change the shape of the element
+PLACEMENT_FIELDS = (
+    "name",
+    "index",
+    "x",
+    "y",
+    "z",
+    "theta",
+    "phi",
+    "psi",
+    "descrip",
+    "passes",
+)
+
+
+def geometry_key(
+    ele: Element,
+    sc: float,
+    cutaway: Optional[str] = None,
+    section: Optional[str] = None,
+):
+    """
+    Hashable key identifying the shape of an element.
+
+    Elements with equal keys have identical local geometry and can share a mesh.
+    """
+    params = []
+    for f in dataclasses.fields(ele):
+        if f.name in PLACEMENT_FIELDS:
+            continue
+        value = getattr(ele, f.name)
+        if isinstance(value, float):
+            value = round(value, 12)
+        params.append((f.name, value))
+    return (
+        type(ele).__name__,
+        tuple(params),
+        round(sc, 12),
+        cutaway,
+        section_type(ele, section),
+    )
+
+
+def drawn_elements(eles):
+    """
+    Elements that have a drawn body. Zero-length markers and mirrors get
+    a small length, other zero-length elements are skipped, as in
+    lattice.ele_objects. The input elements are not modified.
+    """
+    for ele in eles:
+        if ele.L == 0:
+            if ele.key in ("MARKER", "MIRROR"):
+                ele = dataclasses.replace(ele, L=1e-3)
+            else:
+                continue
+        yield ele
@@ -1,9 +1,16 @@
 import argparse
 import logging
+
+from bpy_lattice.elements import dedupe_elements, element_from_values
+
 # from pytao import Tao
 
+logger = logging.getLogger(__name__)
 
-def bpy_lattice_line_from_tao(tao, ele_id):
+HEADER = "# ele_name, ix_ele, x, y, z, theta ,phi, psi, key, L, custom1, custom2, custom3, descrip"
+
+
+def bpy_lattice_values_from_tao(tao, ele_id):
     """
     Parameters
     ----------
@@ -16,8 +23,9 @@ def bpy_lattice_line_from_tao(tao, ele_id):
 
     Returns
     -------
-    line: str
-        comma separated line that the bpy_lattice package expects
+    values: tuple
+        (name, ix_ele, x, y, z, theta, phi, psi, key, L, custom1, custom2, custom3, descrip),
+        the columns of a `.layout_table` line, or None for ignored elements
 
     """
     head = tao.ele_head(ele_id)
@@ -46,7 +54,7 @@ def bpy_lattice_line_from_tao(tao, ele_id):
 
     # Defaults
     if "L" not in attrs:
-        print(name, attrs)
+        logger.warning("%s has no L: %s", name, attrs)
     L = attrs["L"]
 
     # Handle for multipass floor
@@ -95,11 +103,161 @@ def bpy_lattice_line_from_tao(tao, ele_id):
 
     x, y, z, theta, phi, psi = r
 
+    return (
+        name,
+        ix_ele,
+        x,
+        y,
+        z,
+        theta,
+        phi,
+        psi,
+        key,
+        L,
+        custom1,
+        custom2,
+        custom3,
+        descrip,
+    )
+
+
+def bpy_lattice_line_from_tao(tao, ele_id):
+    """
+    Parameters
+    ----------
+    tao : pytao.Tao
+        running instance of tao
+
+    ele_id : int or str
+        Element ID to look up in Tao.
+
+    Returns
+    -------
+    line: str
+        comma separated line that the bpy_lattice package expects
+
+    """
+    values = bpy_lattice_values_from_tao(tao, ele_id)
+    if values is None:
+        return None
+    return table_line(values)
+
+
+def table_line(values):
+    """
+    Format the values of bpy_lattice_values_from_tao as a `.layout_table` line.
+
+    An optional 15th value is the number of passes, written as a 15th column
+    when more than one, see table_values_from_tao.
+    """
+    passes = values[14] if len(values) > 14 else 1
+    (
+        name,
+        ix_ele,
+        x,
+        y,
+        z,
+        theta,
+        phi,
+        psi,
+        key,
+        L,
+        custom1,
+        custom2,
+        custom3,
+        descrip,
+    ) = values[:14]
     line = f"{name}, {ix_ele}, {x}, {y}, {z}, {theta} ,{phi}, {psi}, {key}, {L}, {custom1}, {custom2}, {custom3}, {descrip}"
+    if passes > 1:
+        line += f", {passes}"
     return line
 
 
-def write_bpy_lattice_csv(tao, outfile, ele_list=None):
+def table_values_from_tao(tao, ele_list=None, dedupe=True):
+    """
+    Table values of elements, see bpy_lattice_values_from_tao, with a 15th
+    value: the number of passes.
+
+    Parameters
+    ----------
+    tao: PyTao.tao
+        running instance of tao
+
+    ele_list: list of str or int, optional
+        List of elements to extract
+        Default: None => will match all unique elements of the lattice (i.e., without slaves)
+
+    dedupe: bool
+        Merge repeated passes through the same physical element, as
+        elements.dedupe_elements. Multipass lords are listed once without
+        slaves, but an ele_list of slaves (Q1\\1, Q1\\2) has one entry per pass.
+
+    Returns
+    -------
+    values: list of tuple
+    """
+    if ele_list is None:
+        ele_list = tao.lat_list("*", "ele.ix_ele", flags="-no_slaves")
+
+    values = []
+    for name in ele_list:
+        v = bpy_lattice_values_from_tao(tao, name)
+        if v is not None:
+            values.append(v)
+    if not dedupe:
+        return [(*v, 1) for v in values]
+
+    # ix_ele is unique within the listed branch
+    by_index = {v[1]: v for v in values}
+    eles = dedupe_elements(element_from_values(*v) for v in values)
+    return [(ele.name, *by_index[ele.index][1:], ele.passes) for ele in eles]
+
+
+def elements_from_tao(tao, ele_list=None, outfile=None, dedupe=True):
+    """
+    Yield bpy_lattice elements directly from Tao, without writing and
+    re-parsing a `.layout_table` file.
+
+    The result can be passed straight to lattice.ele_objects:
+
+        eles = list(elements_from_tao(tao))
+        lattice.ele_objects(eles)
+
+    Parameters
+    ----------
+    tao: PyTao.tao
+        running instance of tao
+
+    ele_list: list of str or int, optional
+        List of elements to extract
+        Default: None => will match all unique elements of the lattice (i.e., without slaves)
+
+    outfile: str, optional
+        Also write the `.layout_table` file, as write_bpy_lattice_csv
+
+    dedupe: bool
+        Merge repeated passes, see table_values_from_tao
+
+    Yields
+    ------
+    ele: elements.Element
+    """
+    rows = table_values_from_tao(tao, ele_list, dedupe=dedupe)
+
+    f = open(outfile, "w") if outfile else None
+    try:
+        if f:
+            f.write(HEADER + "\n")
+        for values in rows:
+            if f:
+                print(table_line(values), file=f)
+            yield element_from_values(*values)
+    finally:
+        if f:
+            f.close()
+
+
+def write_bpy_lattice_csv(tao, outfile, ele_list=None, dedupe=True):
     """
     This writes the `.layout_table` style file that the
     bmad_to_blender Fortran program creates for bpy_lattice
@@ -121,20 +279,17 @@ def write_bpy_lattice_csv(tao, outfile, ele_list=None):
         List of elements to extract
         Default: None => will match all unique elements of the lattice (i.e., without slaves)
 
+    dedupe: bool
+        Merge repeated passes, see table_values_from_tao. Elements with more
+        than one pass get a 15th column with the number of passes.
 
     """
-
-    if ele_list is None:
-        ele_list = tao.lat_list("*", "ele.ix_ele", flags="-no_slaves")
-
-    header = "# ele_name, ix_ele, x, y, z, theta ,phi, psi, key, L, custom1, custom2, custom3, descrip"
+    rows = table_values_from_tao(tao, ele_list, dedupe=dedupe)
 
     with open(outfile, "w") as f:
-        f.write(header + "\n")
-        for name in ele_list:
-            line = bpy_lattice_line_from_tao(tao, name)
-            if line is not None:
-                print(line, file=f)
+        f.write(HEADER + "\n")
+        for values in rows:
+            print(table_line(values), file=f)
 
 
 def bmad_to_blender_entrypoint():
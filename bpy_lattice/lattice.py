@@ -1,27 +1,56 @@
 import bpy
-import bmesh
+import logging
+import numpy as np
 import os
 import re
-from mathutils import Matrix, Vector
-from math import sin, cos, pi
+from mathutils import Matrix
+from math import pi
 from typing import Tuple, Optional, List
 
-from bpy_lattice import materials
-from .constants import ELE_COLOR, ELE_X_SCALE, ELE_X_SCALE_FACTOR
+from bpy_lattice import geometry, materials, profiling, slicer
+from .cache import MeshCache
+from .mesh import mesh_from_arrays
+from .catalogue import ModelPrefetcher
+from .geometry import (  # noqa: F401
+    CUTAWAY_WEDGE,
+    box_section,
+    cut_section,
+    ele_color,
+    ellipse_section,
+    faces_from,
+    multipole_section,
+)
+from .style import DEFAULT_STYLE, ElementStyle, Style
 from .elements import (
+    dedupe_elements,
     map_table_element,
     Element,
-    SBend,
-    Pipe,
+    SBend,  # noqa: F401
+    Pipe,  # noqa: F401
 )  # Needed for old code referencing lattice.import_lattice
 
+logger = logging.getLogger(__name__)
 
-def ele_material(ele: Element):
-    key = ele.key
-    name = key + "_material"
-    if name in bpy.data.materials:
-        return bpy.data.materials[name]
-    return materials.diffuse_material(name, color=ele_color(ele) + tuple([1]))
+# Custom property marking collections created by ele_objects(bulk=True)
+BUILD_TAG = "bpy_lattice"
+
+
+def ele_material(ele: Element, style: Style = DEFAULT_STYLE):
+    """
+    Material of an element key, shared by all elements of that key.
+
+    Materials with the default style colors are named KEY_material.
+    Other colors get the hex color in the name (e.g. KEY_material_ff8000),
+    so builds with different styles do not share materials.
+    """
+    color = ele_color(ele, style)
+    name = ele.key + "_material"
+    if color != ele_color(ele, DEFAULT_STYLE):
+        name += "_" + "".join(f"{round(255 * c):02x}" for c in color)
+    with profiling.stage("material"):
+        if name in bpy.data.materials:
+            return bpy.data.materials[name]
+        return materials.diffuse_material(name, color=color + tuple([1]))
 
 
 def blendfile(ele: Element):
@@ -32,140 +61,80 @@ def blendfile(ele: Element):
         return None
 
 
-def ele_x_scale(ele: Element):
+def ele_x_scale(ele: Element, style: Style = DEFAULT_STYLE):
     """
     Scale factor for an element
     """
-    key = ele.key
-    scale = 1
-    if key in ELE_X_SCALE:
-        scale = ELE_X_SCALE[key]
-    else:
-        print(f"missing {key} in ELE_X_SCALE ")
-
-    return ELE_X_SCALE_FACTOR * scale
+    return geometry.ele_x_scale(ele, style)
 
 
-def ele_color(ele: Element):
-    """
-    Color for an element
+def ele_section(
+    s_rel, ele: Element, cutaway: Optional[str] = None, style: Style = DEFAULT_STYLE
+):
     """
-    color = (0, 0, 0)
-    key = ele.key
-    if key in ELE_COLOR:
-        color = ELE_COLOR[key]
-
-    return color
-
+    Make sections relative to center of element
 
-def faces_from(sections, closed=True):
+    cutaway: str, optional
+        Remove a wedge from the section, see CUTAWAY_WEDGE.
     """
-    A section is a list of vertices that defines a cross-section of an element
-    This makes rectangle faces
-    """
-    nix = [len(s) for s in sections]
-    if len(set(nix)) > 1:
-        print("ERROR: sections must have the same number of points")
-        return
-    n = nix[0]
-    faces = []
-    for i0 in range(len(sections) - 1):
-        for j in range(n - 1):
-            faces.append(
-                (i0 * n + j, (i0 + 1) * n + j, (i0 + 1) * n + j + 1, i0 * n + j + 1)
-            )
-        faces.append((i0 * n + n - 1, (i0 + 1) * n + n - 1, (i0 + 1) * n, i0 * n))
-    if closed:
-        faces.append(list(reversed(range(n))))  # first section
-        faces.append(
-            range((len(sections) - 1) * n, (len(sections) - 1) * n + n)
-        )  # Last section
-    return faces
-
-
-def box_section(X, haperture, vaperture):
-    return (
-        (X, haperture, vaperture),
-        (X, -haperture, vaperture),
-        (X, -haperture, -vaperture),
-        (X, haperture, -vaperture),
+    look = style.lookup(ele.key)
+    return geometry.ele_section(
+        s_rel, ele, look.scale, cutaway=cutaway, section=look.section
     )
 
 
-def ellipse_section(X, haperture, vaperture, n=30):
-    angles = [2 * pi * i / n for i in range(n)]
-    return [(X, haperture * cos(a), vaperture * sin(a)) for a in angles]
-
-
-def multipole_section(X, aperture, n):
-    angles = [pi * i / n + pi / (2 * n) for i in range(2 * n)]
-    return [(X, aperture * cos(a), aperture * sin(a)) for a in angles]
+def set_shading(objects, smooth: bool = True):
+    """
+    Set smooth or flat shading of all faces of the objects' meshes in bulk.
+    """
+    meshes = {ob.data for ob in objects if ob.type == "MESH"}
+    for mesh in meshes:
+        flags = np.full(len(mesh.polygons), smooth, dtype=bool)
+        mesh.polygons.foreach_set("use_smooth", flags)
+        mesh.update()
 
 
-def ele_section(s_rel, ele: Element):
-    """
-    Make sections relative to center of element
+def ele_mesh(
+    ele: Element,
+    cutaway: Optional[str] = None,
+    mesh_cache: Optional[MeshCache] = None,
+    style: Style = DEFAULT_STYLE,
+    ele_style: Optional[ElementStyle] = None,
+):
     """
-    sc = ele_x_scale(ele)
-    if ele.key == "QUADRUPOLE":
-        return multipole_section(s_rel, sc, 4)
-    if ele.key == "SEXTUPOLE":
-        return multipole_section(s_rel, sc, 6)
-    elif isinstance(ele, SBend):
-        a = ele.angle
-        if abs(a) < 1e-5 or abs(ele.L) < 1e-5:
-            return box_section(s_rel, sc, sc)
-        L = ele.L
-        rho = L / a
-        # Baseline section
-        s0 = box_section(0, sc, sc)
-        # Edge angle
-        f = s_rel / L + 0.5
-        edge = ele.e2 * f + (-1) * ele.e1 * (1 - f)
-        m0 = Matrix.Rotation(edge, 4, "Z")
-        m1 = Matrix.Translation((0, rho, 0))
-        m2 = Matrix.Rotation(-s_rel / rho, 4, "Z")
-        m3 = Matrix.Translation((0, -rho, 0))
-        m = m3 @ m2 @ m1 @ m0
-        sec = []
-        for p in s0:
-            v = m @ Vector(p)
-            sec.append(v[:])
-        return sec
-
-    elif ele.key == "WIGGLER":
-        return box_section(s_rel, sc, 2 * sc)
-    elif isinstance(ele, Pipe):
-        rx = ele.radius_x
-        ry = ele.radius_y
-        t = ele.thickness
-        if rx == 0 or ry == 0:
-            return ellipse_section(s_rel, sc, sc)
-        else:
-            return ellipse_section(s_rel, rx + t, ry + t)
-    else:
-        return ellipse_section(s_rel, sc, sc)
+    Mesh for an element.
 
+    mesh_cache: MeshCache, optional
+        Reuse mesh arrays generated in earlier builds
+    style: Style
+        Drawing style. With style.smooth, custom normals are set.
+    ele_style: ElementStyle, optional
+        Style of this element already resolved from style
 
-def ele_mesh(ele: Element):
+    Generated faces are consistently wound outward, so the mesh needs no
+    normal recalculation (see fix_mesh).
+    """
     name = ele.name
-    print("Mesh: ", name)
-    L = ele.L
-    if ele.key == "SBEND":
-        n = 20
-        slist = [L * i / (n - 1) - L / 2 for i in range(n)]
-    else:
-        slist = [-L / 2, L / 2]
-    sections = [ele_section(s_rel, ele) for s_rel in slist]
-    faces = faces_from(sections)
-    verts = []
-    for s in sections:
-        for p in s:
-            verts.append(p)
-
-    mesh = bpy.data.meshes.new(name)
-    mesh.from_pydata(verts, [], faces)
-    mesh.update(calc_edges=True)
+    logger.debug("Mesh: %s", name)
+    with profiling.stage("section"):
+        sc, _, section = ele_style or style.lookup(ele.key)
+        if mesh_cache is not None:
+            verts, loop_vertices, loop_totals = mesh_cache.mesh_arrays(
+                ele, sc, cutaway=cutaway, section=section
+            )
+        else:
+            verts, loop_vertices, loop_totals = geometry.ele_arrays(
+                ele, sc, cutaway=cutaway, section=section
+            )
+        normals = None
+        if style.smooth:
+            normals = geometry.loop_normals(verts, loop_vertices, loop_totals)
+
+    with profiling.stage("mesh"):
+        mesh = mesh_from_arrays(name, verts, loop_vertices, loop_totals, normals)
+    profiling.count("meshes")
+    profiling.count("vertices", len(verts))
+    profiling.count("faces", len(loop_totals))
     return mesh
 
 
@@ -195,36 +164,57 @@ def load_blend(filepath):
     """
     Load .blend model objects.
     """
-    with bpy.data.libraries.load(filepath, link=False) as (data_from, data_to):
-        onames = [name for name in data_from.objects if True]
-        print("Library: ", filepath)
-        print("         has objects", onames)
-        data_to.objects = data_from.objects
+    with profiling.stage("cad"):
+        with bpy.data.libraries.load(filepath, link=False) as (data_from, data_to):
+            logger.info("Library: %s has objects %s", filepath, list(data_from.objects))
+            data_to.objects = data_from.objects
+    profiling.count("libraries")
     return data_to.objects
 
 
-def add_children_from_blend(parent, blendfilepath, libdict):
+def add_children_from_blend(parent, blendfilepath, libdict, collection=None):
+    """
+    Add the objects of a .blend file as children of parent, linked to
+    collection (default: the context collection).
+
+    The loaded objects are kept out of the scene in libdict, and every use
+    of the model adds copies of them that share their meshes.
+    """
+    collection = collection or bpy.context.collection
     if blendfilepath in libdict:
-        print("Library already loaded: ", blendfilepath)
-        print("Data will be linked")
-        # Library has already been loaded. Copy meshes and materials
-        children = []
-        for o in libdict[blendfilepath]:
-            child = bpy.data.objects.new(o.name, o.data)
-            child.location = o.location
-            child.rotation_euler = o.rotation_euler
-            children.append(child)
+        logger.debug("Library already loaded, data will be linked: %s", blendfilepath)
     else:
-        print("New library: ", blendfilepath)
-        children = load_blend(blendfilepath)
-        libdict[blendfilepath] = children
-    for child in children:
-        bpy.context.collection.objects.link(child)
-        if child.parent is None:
-            child.parent = parent
+        logger.debug("New library: %s", blendfilepath)
+        libdict[blendfilepath] = load_blend(blendfilepath)
+    children = copy_objects(libdict[blendfilepath])
+    with profiling.stage("link"):
+        for child in children:
+            collection.objects.link(child)
+            if child.parent is None:
+                child.parent = parent
+    profiling.count("cad_children", len(children))
+
+
+def copy_objects(objects):
+    """
+    Copies of objects sharing their data, with parents within objects
+    mapped to the copies.
+    """
+    copies = {o: o.copy() for o in objects}
+    for copy in copies.values():
+        if copy.parent in copies:
+            copy.parent = copies[copy.parent]
+    return list(copies.values())
 
 
 def fix_mesh(mesh):
+    """
+    Recalculate face normals with bmesh.
+
+    Not needed for meshes made by ele_mesh, which are wound consistently.
+    """
+    import bmesh
+
     bm = bmesh.new()
     bm.from_mesh(mesh)
     bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
@@ -233,6 +223,9 @@ def fix_mesh(mesh):
 
 
 def old_fix_mesh(object):
+    """
+    Recalculate outside normals with edit mode operators. See fix_mesh.
+    """
     bpy.context.scene.objects.active = object
     bpy.ops.object.mode_set(mode="EDIT")
 
@@ -248,107 +241,302 @@ def old_fix_mesh(object):
 
 def ele_object(
     ele: Element,
-    library: dict = {},
+    library: Optional[dict] = None,
     use_real_model: bool = False,
     catalogue: Optional[str] = None,
     hide_real_model: bool = True,
     keep_simple_model: bool = True,
+    cutaway: Optional[str] = None,
+    mesh_cache: Optional[MeshCache] = None,
+    style: Style = DEFAULT_STYLE,
+    ele_style: Optional[ElementStyle] = None,
+    collection=None,
+    hidden: Optional[list] = None,
+    prefetcher: Optional[ModelPrefetcher] = None,
 ):
-    print("Object: ", ele.name)
+    """
+    Create the object for an element, linked to collection
+    (default: the context collection).
+
+    If prefetcher (a catalogue.ModelPrefetcher) is given, CAD models are
+    loaded from the files it prepared.
+
+    Objects that should be hidden in the viewport are appended to hidden
+    if given, rather than hidden immediately. This allows building into
+    collections that are not linked to the scene yet, see ele_objects.
+    """
+    logger.debug("Object: %s", ele.name)
+    library = {} if library is None else library
+    ele_style = ele_style or style.lookup(ele.key)
+    collection = collection or bpy.context.collection
 
     # Load blender model of element
     bfile = blendfile(ele)
 
     # Setup material
-    mat = ele_material(ele)
-    mat.diffuse_color = ele_color(ele) + tuple([1])
+    mat = ele_material(ele, style)
+    mat.diffuse_color = ele_style.color + tuple([1])
 
     object = None
     if bfile and use_real_model and catalogue:
-        f = os.path.join(catalogue, bfile)
-        if os.path.isfile(f):
-            print("blend file: ", f, "exists!")
+        if prefetcher is not None:
+            # Missing models were warned about once, by prefetcher.start
+            f = prefetcher.path(bfile)
+            found = f is not None
+        else:
+            f = os.path.join(catalogue, bfile)
+            found = os.path.isfile(f)
+            if not found:
+                logger.warning("Blend file missing: %s", f)
+        if found:
+            logger.debug("blend file exists: %s", f)
 
             # Setup parent
             if keep_simple_model:
-                object = bpy.data.objects.new(ele.name, ele_mesh(ele))
+                object = bpy.data.objects.new(
+                    ele.name,
+                    ele_mesh(
+                        ele,
+                        cutaway=cutaway,
+                        mesh_cache=mesh_cache,
+                        style=style,
+                        ele_style=ele_style,
+                    ),
+                )
                 object.data.materials.append(mat)
             else:
                 object = bpy.data.objects.new(ele.name, None)
-            bpy.context.collection.objects.link(object)
+            with profiling.stage("link"):
+                collection.objects.link(object)
 
             # Add the CAD model from blend file
-            add_children_from_blend(object, f, library)
+            add_children_from_blend(object, f, library, collection=collection)
+            if prefetcher is not None:
+                prefetcher.record(bfile, library[f])
 
             # Hide options for preview
-            if hide_real_model:
-                for c in object.children:
-                    c.hide_set(True)
+            hide = list(object.children) if hide_real_model else [object]
+            if hidden is None:
+                for ob in hide:
+                    ob.hide_set(True)
             else:
-                object.hide_set(True)
+                hidden.extend(hide)
             object.hide_render = True
-        else:
-            print("Blend file missing: ", f)
 
     if object is None:
-        object = bpy.data.objects.new(ele.name, ele_mesh(ele))
+        object = bpy.data.objects.new(
+            ele.name,
+            ele_mesh(
+                ele,
+                cutaway=cutaway,
+                mesh_cache=mesh_cache,
+                style=style,
+                ele_style=ele_style,
+            ),
+        )
         object.data.materials.append(mat)
-        bpy.context.collection.objects.link(object)
+        with profiling.stage("link"):
+            collection.objects.link(object)
 
-    object.location = (0, 0, 0)
+    profiling.count("objects")
 
     return object
 
 
 def ele_objects(
     eles: List[Element],
-    library: dict = {},
+    library: Optional[dict] = None,
     use_real_model: bool = False,
     catalogue: Optional[str] = None,
     hide_real_model: bool = True,
     origin: Tuple[float, float, float] = (0, 0, 0),
     keep_simple_model: bool = True,
+    cutaway: Optional[str] = None,
+    mesh_cache: Optional[MeshCache] = None,
+    style: Style = DEFAULT_STYLE,
+    bulk: bool = False,
+    collection_name: str = "lattice",
+    prefetcher: Optional[ModelPrefetcher] = None,
+    dedupe: bool = True,
 ):
     """
     Create multiple objects from a list of eles (a lattice)
-    """
-    Xcenter, Ycenter, Zcenter = origin
 
-    objects = []
+    With dedupe=True, repeated passes through the same physical element
+    in multipass lattices are built once (see elements.dedupe_elements),
+    and their objects get a "passes" custom property.
+
+    With bulk=True, objects are built unlinked, in one child collection per
+    element key of a new collection named collection_name. This is linked
+    to the scene in one step at the end, followed by a single view layer
+    update, instead of updating the scene for every object.
+
+    The style (see style.Style) sets scales, colors and section shapes,
+    and is resolved once for all elements.
+
+    If cutaway is given (see CUTAWAY_WEDGE), procedural meshes are
+    clipped analytically, and only imported CAD children are cut
+    with a boolean punch.
+
+    If mesh_cache is given, procedural mesh arrays are read from and
+    stored in this cache.MeshCache, which is saved at the end.
+
+    With use_real_model, the referenced CAD models are first checked and
+    read on a thread pool by prefetcher (default: a new
+    catalogue.ModelPrefetcher of catalogue, which loads models in place,
+    closed at the end).
+    """
+    library = {} if library is None else library
+    drawn = []
     for ele in eles:
         if ele.L == 0:
             if ele.key in ("MARKER", "MIRROR"):
                 ele.L = 1e-3
             else:
                 continue
+        drawn.append(ele)
+    if dedupe:
+        drawn = dedupe_elements(drawn)
+
+    # All world matrices at once, applied with one write per object
+    matrices = geometry.ele_matrices(drawn, origin=origin)
+    table = style.resolve(ele.key for ele in drawn)
+    rows = table.indices(drawn)
+
+    own_prefetcher = False
+    if use_real_model and catalogue:
+        if prefetcher is None:
+            # Models are loaded in place, keeping their relative paths
+            prefetcher = ModelPrefetcher(catalogue)
+            own_prefetcher = True
+        prefetcher.start(drawn)
+
+    try:
+        root, hidden = None, None
+        key_collections = {}
+        if bulk:
+            root = bpy.data.collections.new(collection_name)
+            root[BUILD_TAG] = True
+            hidden = []
+
+        objects = []
+        for ele, m, row in zip(drawn, matrices, rows):
+            collection = None
+            if bulk:
+                collection = key_collections.get(ele.key)
+                if collection is None:
+                    collection = bpy.data.collections.new(
+                        f"{collection_name}_{ele.key}"
+                    )
+                    collection[BUILD_TAG] = True
+                    root.children.link(collection)
+                    key_collections[ele.key] = collection
+            ob = ele_object(
+                ele,
+                library=library,
+                use_real_model=use_real_model,
+                hide_real_model=hide_real_model,
+                catalogue=catalogue,
+                keep_simple_model=keep_simple_model,
+                cutaway=cutaway,
+                mesh_cache=mesh_cache,
+                style=style,
+                ele_style=table.rows[row],
+                collection=collection,
+                hidden=hidden,
+                prefetcher=prefetcher,
+            )
 
-        ob = ele_object(
-            ele,
-            library=library,
-            use_real_model=use_real_model,
-            hide_real_model=hide_real_model,
-            catalogue=catalogue,
-            keep_simple_model=keep_simple_model,
-        )
+            ob.matrix_world = Matrix(m)
+            if ele.passes > 1:
+                ob["passes"] = ele.passes
+
+            objects.append(ob)
+
+        if bulk:
+            with profiling.stage("link"):
+                bpy.context.collection.children.link(root)
+                bpy.context.view_layer.update()
+            for ob in hidden:
+                ob.hide_set(True)
+    finally:
+        if mesh_cache is not None:
+            mesh_cache.save()
+        if own_prefetcher:
+            prefetcher.close()
+        elif prefetcher is not None:
+            prefetcher.save()
+
+    if cutaway:
+        cut_children(objects, cutaway)
 
-        # Set location and angles
-        ob.rotation_euler.z = ele.theta
-        ob.rotation_euler.y = -ele.phi
-        ob.rotation_euler.x = ele.psi
-        ob.location = (ele.z - Xcenter, ele.x - Ycenter, ele.y - Zcenter)
+    return objects
 
-        objects.append(ob)
 
-    return objects
+def cut_children(objects, cutaway: str):
+    """
+    Boolean-cut the CAD children of objects with a wedge punch
+    placed in each parent's frame.
+
+    Children share the meshes of the objects cached in the library, so each
+    distinct mesh is cut once per placement relative to its parent, and the
+    cut mesh is shared by the children placed alike. The library is not
+    modified.
+    """
+    parents = [ob for ob in objects if ob.children]
+    if not parents:
+        return
+    logger.info("Cutting CAD children of %d objects", len(parents))
+    punch = slicer.wedge_punch(*CUTAWAY_WEDGE[cutaway])
+    bpy.context.view_layer.update()  # Make matrix_world current
+    cut = {}
+    for ob in parents:
+        punch.matrix_world = ob.matrix_world
+        bpy.context.view_layer.update()
+        inverse = ob.matrix_world.inverted()
+        for child in ob.children_recursive:
+            if child.type != "MESH":
+                continue
+            relative = inverse @ child.matrix_world
+            key = (child.data, tuple(round(v, 9) for row in relative for v in row))
+            if key in cut:
+                child.data = cut[key]
+            else:
+                cut[key] = slicer.apply_cut(child, punch).data
+    bpy.data.objects.remove(punch)
 
 
 def lat_borders(lat, dim="x"):
-    xlist = [ele[dim] for ele in lat]
-    return min(xlist), max(xlist)
+    """
+    (min, max) of an element position attribute. See bounds.LatticeBounds
+    for the extents of the drawn lattice.
+    """
+    values = geometry.element_columns(lat, names=(dim,))[dim]
+    return values.min(), values.max()
 
 
 def import_lattice(file):
-    with open(file, "r") as f:
+    with profiling.stage("parse"), open(file, "r") as f:
         next(f)  # Skip the header line
         lat = [map_table_element(line) for line in f]
+    profiling.count("elements", len(lat))
     return lat
+
+
+# Module settings replaced by style.Style in this version. Reading them
+# raises with a pointer to the replacement. Assigning them (e.g.
+# lattice.ELE_X_SCALE_FACTOR = 3) cannot be detected, and has no effect.
+_REMOVED = {
+    "ELE_X_SCALE": 'Style().replace(x_scale={"KEY": scale})',
+    "ELE_COLOR": 'Style().replace(colors={"KEY": (r, g, b)})',
+    "ELE_X_SCALE_FACTOR": "Style().replace(scale_factor=...)",
+}
+
+
+def __getattr__(name):
+    if name in _REMOVED:
+        raise AttributeError(
+            f"lattice.{name} was removed. Pass style={_REMOVED[name]} "
+            "to ele_objects instead, see bpy_lattice.style"
+        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -36,4 +36,17 @@ def diffuse_material(name, color=(1, 0, 0, 1)):
     return mat
 
 
-LIGHT_MATERIAL = emission_material("light", strength=100)
+def light_material(name="light", strength=100):
+    """
+    Emission material for light panels, created on first use.
+    """
+    if name in bpy.data.materials:
+        return bpy.data.materials[name]
+    return emission_material(name, strength=strength)
+
+
+def __getattr__(name):
+    # LIGHT_MATERIAL used to be created at import time
+    if name == "LIGHT_MATERIAL":
+        return light_material()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,38 @@
+"""
+Low-level Blender mesh construction from arrays, shared by the lattice,
+orbit and slicer modules.
+"""
+
+import bpy
+import numpy as np
+
+
+def mesh_from_arrays(name, verts, loop_vertices, loop_totals, normals=None):
+    """
+    Create a mesh from flat arrays with bulk foreach_set calls.
+
+    Parameters
+    ----------
+    verts: array of shape (n_vertices, 3)
+    loop_vertices: int array
+        Vertex index of each face corner, face after face
+    loop_totals: int array
+        Number of corners of each face
+    normals: array of shape (n_loops, 3), optional
+        Custom split normals. If given, the mesh is shaded smooth.
+    """
+    loop_starts = np.zeros(len(loop_totals), dtype=np.int32)
+    loop_starts[1:] = np.cumsum(loop_totals)[:-1]
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set("co", np.asarray(verts, dtype=np.float32).ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set("vertex_index", np.asarray(loop_vertices, dtype=np.int32))
+    mesh.polygons.add(len(loop_totals))
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+    mesh.polygons.foreach_set("loop_total", np.asarray(loop_totals, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    if normals is not None:
+        mesh.polygons.foreach_set("use_smooth", np.ones(len(loop_totals), dtype=bool))
+        mesh.normals_split_custom_set(normals)
+    return mesh
@@ -1,12 +1,18 @@
 import bpy
+import logging
+import numpy as np
 from math import sin, cos, pi, sqrt, atan2
 
-from bpy_lattice import materials
+from bpy_lattice import geometry, materials
+from bpy_lattice.geometry import faces_from  # noqa: F401
+from bpy_lattice.mesh import mesh_from_arrays
+
+logger = logging.getLogger(__name__)
 
 
 def import_orbit(file):
     with open(file, "r") as f:
-        print(next(f))  # Print the first header line
+        logger.info(next(f).strip())  # Log the first header line
         next(f)  # Skip the second header line
         orbit = [parse_orbit_line(line) for line in f]
     return orbit
@@ -20,34 +26,10 @@ def parse_orbit_line(line):
     #  0  1   2  3   4  5   6  7      8
     # (y, py, z, pz, x, px, t, e_tot, s_position)  = coords
     coords = [float(s) for s in dat[0:9] + dat[11:15]]
-    print(coords)
+    logger.debug("%s", coords)
     return coords
 
 
-def faces_from(sections, closed=True):
-    """
-    A section is a list of vertices that defines a cross-section of an element
-    """
-    nix = [len(s) for s in sections]
-    if len(set(nix)) > 1:
-        print("ERROR: sections must have the same number of points")
-        return
-    n = nix[0]
-    faces = []
-    for i0 in range(len(sections) - 1):
-        for j in range(n - 1):
-            faces.append(
-                (i0 * n + j, (i0 + 1) * n + j, (i0 + 1) * n + j + 1, i0 * n + j + 1)
-            )
-        faces.append((i0 * n + n - 1, (i0 + 1) * n + n - 1, (i0 + 1) * n, i0 * n))
-    if closed:
-        faces.append(range(n))  # first section
-        faces.append(
-            range((len(sections) - 1) * n, (len(sections) - 1) * n + n)
-        )  # Last section
-    return faces
-
-
 def beam_sizes(coords, beam):
     beta_a, eta_x, beta_b, eta_y = coords[9:13]
     e_tot = coords[7]
@@ -79,19 +61,16 @@ def orbit_section(coords, rx, ry, n=30, beam=None):
     # return [ (x + rx*cos(a)*cos(theta), y + ry*sin(a),  z + rx*cos(a)*sin(theta)) for a in angles]
 
 
-def orbit_mesh(orbit, name, beam=None):
+def orbit_mesh(orbit, name, beam=None, n=16):
+    """
+    Tube mesh along the orbit, with n points per section
+    """
     rx = 0.012  # 12 mm
     ry = 0.012
-    sections = [orbit_section(coords, rx, ry, n=16, beam=beam) for coords in orbit]
-    faces = faces_from(sections)
-    verts = []
-    for s in sections:
-        for p in s:
-            verts.append(p)
-
-    mesh = bpy.data.meshes.new(name)
-    mesh.from_pydata(verts, [], faces)
-    return mesh
+    sections = [orbit_section(coords, rx, ry, n=n, beam=beam) for coords in orbit]
+    loop_vertices, loop_totals = geometry.strip_topology(len(sections), n)
+    verts = np.array(sections, dtype=float).reshape(-1, 3)
+    return mesh_from_arrays(name, verts, loop_vertices, loop_totals)
 
 
 ENERGY_COLOR = {
@@ -0,0 +1,177 @@
+"""
+Timing and profiling instrumentation for scene builds.
+
+Library code marks its work with `stage` and `count`:
+
+    with profiling.stage("mesh"):
+        ...
+    profiling.count("vertices", n)
+
+These are no-ops unless a build is being recorded:
+
+    with profiling.build("lat", json_file="lat_build.json") as stats:
+        eles = lattice.import_lattice("lat.layout_table")
+        lattice.ele_objects(eles)
+    print(stats.summary())
+
+Progress messages go to the `bpy_lattice` logger. Enable them with e.g.
+`logging.basicConfig(level=logging.DEBUG)`.
+"""
+
+import cProfile
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+logger = logging.getLogger("bpy_lattice")
+
+# Stage names used by the build pipeline
+STAGES = (
+    "parse",  # reading the layout table
+    "section",  # section generation
+    "mesh",  # creating mesh datablocks
+    "link",  # linking objects into collections
+    "material",  # material lookup/creation
+    "cad",  # loading 3DMODEL .blend files
+    "slice",  # boolean cutaways
+    "render",  # rendering images
+)
+
+
+class BuildStats:
+    """
+    Accumulated per-stage wall times, call counts and counters for one build.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.timers = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.t_start = time.perf_counter()
+        self.t_total = None
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - t0
+            self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def finish(self):
+        self.t_total = time.perf_counter() - self.t_start
+
+    def summary(self) -> dict:
+        """
+        Machine-readable summary of the build.
+        """
+        total = self.t_total
+        if total is None:
+            total = time.perf_counter() - self.t_start
+        return {
+            "name": self.name,
+            "total_time": total,
+            "stages": {
+                k: {"time": self.timers[k], "calls": self.calls[k]}
+                for k in sorted(self.timers)
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_json(self, file: str):
+        with open(file, "w") as f:
+            json.dump(self.summary(), f, indent=1)
+
+
+class _NullStats:
+    """
+    Stand-in when no build is recorded. All methods are no-ops.
+    """
+
+    _null = nullcontext()
+
+    def stage(self, name):
+        return self._null
+
+    def count(self, name, n=1):
+        pass
+
+
+_NULL_STATS = _NullStats()
+_active = _NULL_STATS
+
+
+def active():
+    """
+    The BuildStats being recorded, or a no-op stand-in.
+    """
+    return _active
+
+
+def stage(name: str):
+    """
+    Context manager timing a stage of the active build.
+    """
+    return _active.stage(name)
+
+
+def count(name: str, n: int = 1):
+    """
+    Increment a counter of the active build.
+    """
+    _active.count(name, n)
+
+
+@contextmanager
+def build(
+    name: str = "",
+    json_file: Optional[str] = None,
+    profile_file: Optional[str] = None,
+):
+    """
+    Record timing for everything inside the block.
+
+    Parameters
+    ----------
+    name: str
+        Label stored in the summary
+    json_file: str, optional
+        Write the summary as JSON here when the block exits
+    profile_file: str, optional
+        Also run cProfile and dump the stats here (readable with pstats)
+
+    Yields
+    ------
+    stats: BuildStats
+    """
+    global _active
+    previous = _active
+    stats = BuildStats(name)
+    _active = stats
+    profiler = cProfile.Profile() if profile_file else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield stats
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+        _active = previous
+        stats.finish()
+        if json_file:
+            stats.to_json(json_file)
+        logger.info(
+            "Build %s: %.3f s %s",
+            name,
+            stats.t_total,
+            ", ".join(f"{k}={v:.3f}s" for k, v in sorted(stats.timers.items())),
+        )
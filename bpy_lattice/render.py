@@ -0,0 +1,314 @@
+"""
+Headless batch rendering of lattice tables.
+
+Example
+-------
+    bpy-lattice-render lat1.layout_table lat2.layout_table \
+        --view top --view perspective:d=40 --output-dir renders
+
+This also works with the Blender executable, passing arguments after `--`:
+
+    blender -b --python-expr "from bpy_lattice.render import render_entrypoint; render_entrypoint()" \
+        -- lat.layout_table --view top
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import bpy
+
+from bpy_lattice import camera, lattice, profiling
+from bpy_lattice.bounds import LatticeBounds
+from bpy_lattice.cache import MeshCache
+from bpy_lattice.style import DEFAULT_STYLE
+
+# Named camera setups. `type` selects camera.camera_at, camera.ortho_camera_at
+# or camera.frame_bounds ("fit"), the remaining items are passed as keyword
+# arguments.
+CAMERA_PRESETS = {
+    "perspective": {"type": "perspective", "d": 20},
+    "top": {"type": "ortho", "z": 10, "scale": 20},
+    "fit": {"type": "fit", "view": "perspective"},
+    "fit-top": {"type": "fit", "view": "top", "oriented": True},
+}
+
+
+def _view_value(value: str):
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_view(spec: str) -> Tuple[str, Dict]:
+    """
+    Parse a view specification like `top`, `perspective:d=40` or
+    `fit-top:names=Q*` into (name, settings), starting from CAMERA_PRESETS[name].
+    Values that are not numbers are kept as strings.
+    """
+    name, _, args = spec.partition(":")
+    if name not in CAMERA_PRESETS:
+        raise ValueError(
+            f"Unknown camera preset {name!r}. Choose from {list(CAMERA_PRESETS)}"
+        )
+    view = dict(CAMERA_PRESETS[name])
+    for item in filter(None, args.split(",")):
+        key, _, value = item.partition("=")
+        view[key.strip()] = _view_value(value)
+    return name, view
+
+
+def apply_view(view: Dict, bounds: Optional[LatticeBounds] = None):
+    """
+    Position the scene camera according to a view dict.
+
+    "fit" views frame the lattice bounds, which are required for them.
+    """
+    camera.ensure_camera()
+    kwargs = {k: v for k, v in view.items() if k != "type"}
+    if view["type"] == "fit":
+        if bounds is None:
+            raise ValueError("Fit views need the lattice bounds")
+        for key in ("start", "end"):
+            if isinstance(kwargs.get(key), float):
+                kwargs[key] = int(kwargs[key])
+        camera.frame_bounds(bounds, **kwargs)
+    elif view["type"] == "ortho":
+        camera.ortho_camera_at(**kwargs)
+    else:
+        camera.camera_at(**kwargs)
+
+
+def reset_scene():
+    """
+    Start from an empty scene with a camera and a sun.
+    """
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    camera.ensure_camera()
+    light = bpy.data.lights.new("Sun", type="SUN")
+    light.energy = 3
+    sun = bpy.data.objects.new("Sun", light)
+    sun.location = (0, 0, 10)
+    bpy.context.scene.collection.objects.link(sun)
+
+
+def lattice_center(eles) -> Tuple[float, float, float]:
+    """
+    Center of the element positions, in the (z, x, y) order
+    of the `origin` setting of lattice.ele_objects
+    """
+    if not eles:
+        return (0, 0, 0)
+    return tuple(float(sum(lattice.lat_borders(eles, dim))) / 2 for dim in "zxy")
+
+
+def setup_render(
+    resolution: Tuple[int, int] = (1920, 1080),
+    engine: str = "CYCLES",
+    samples: int = 32,
+):
+    scene = bpy.context.scene
+    scene.render.engine = engine
+    scene.render.resolution_x, scene.render.resolution_y = resolution
+    scene.render.resolution_percentage = 100
+    scene.render.image_settings.file_format = "PNG"
+    if engine == "CYCLES":
+        scene.cycles.samples = samples
+        scene.cycles.device = "CPU"
+
+
+def render_layout(
+    layout_file: str,
+    views: List[str],
+    output_dir: str = ".",
+    resolution: Tuple[int, int] = (1920, 1080),
+    engine: str = "CYCLES",
+    samples: int = 32,
+    save_blend: bool = False,
+    center: bool = True,
+    reset: bool = True,
+    stats: bool = False,
+    profile: bool = False,
+    **settings,
+) -> List[str]:
+    """
+    Build a lattice table into a fresh scene and render it from each view.
+
+    Parameters
+    ----------
+    layout_file: str
+        `.layout_table` file to import
+    views: list of str
+        View specifications, see `parse_view`
+    output_dir: str
+        Directory for images (and the .blend file)
+    center: bool
+        Recenter the lattice at the origin
+    reset: bool
+        Start from a factory-fresh scene. If False, the caller is
+        responsible for clearing the scene.
+    stats: bool
+        Write a JSON timing summary of the build, see profiling.build
+    profile: bool
+        Also write cProfile stats of the build
+    **settings:
+        Passed to lattice.ele_objects. Objects are built in bulk into a
+        collection named after the layout file unless bulk=False is given.
+        CAD models are loaded into a new library unless library is given,
+        as by the worker, which keeps them in the scene between layouts.
+
+    Returns
+    -------
+    outputs: list of str
+        Files written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(layout_file))[0]
+
+    if reset:
+        reset_scene()
+    setup_render(resolution=resolution, engine=engine, samples=samples)
+
+    outputs = []
+    stats_file = os.path.join(output_dir, f"{stem}_build.json") if stats else None
+    profile_file = os.path.join(output_dir, f"{stem}.prof") if profile else None
+    with profiling.build(stem, json_file=stats_file, profile_file=profile_file):
+        eles = lattice.import_lattice(layout_file)
+        if center:
+            settings.setdefault("origin", lattice_center(eles))
+        # CAD objects loaded for a previous layout are freed by reset_scene
+        settings.setdefault("library", {})
+        settings.setdefault("bulk", True)
+        settings.setdefault("collection_name", stem)
+        lattice.ele_objects(eles, **settings)
+        # Computed once for all framed views
+        bounds = LatticeBounds(
+            eles,
+            origin=settings.get("origin", (0, 0, 0)),
+            style=settings.get("style", DEFAULT_STYLE),
+        )
+
+        for i, spec in enumerate(views):
+            name, view = parse_view(spec)
+            apply_view(view, bounds)
+            if name in [parse_view(other)[0] for other in views[:i]]:
+                name = f"{name}_{i}"  # Same preset with other settings
+            outfile = os.path.abspath(os.path.join(output_dir, f"{stem}_{name}.png"))
+            bpy.context.scene.render.filepath = outfile
+            with profiling.stage("render"):
+                bpy.ops.render.render(write_still=True)
+            outputs.append(outfile)
+    outputs += [f for f in (stats_file, profile_file) if f]
+
+    if save_blend:
+        blendfile = os.path.abspath(os.path.join(output_dir, f"{stem}.blend"))
+        bpy.ops.wm.save_as_mainfile(filepath=blendfile)
+        outputs.append(blendfile)
+
+    return outputs
+
+
+def script_args(argv: Optional[List[str]] = None) -> List[str]:
+    """
+    Arguments for this script. Under the Blender executable, these follow `--`.
+    """
+    if argv is None:
+        argv = sys.argv
+        if "--" in argv:
+            return argv[argv.index("--") + 1 :]
+        return argv[1:]
+    return argv
+
+
+def render_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Build and render .layout_table files without the Blender GUI."
+    )
+    parser.add_argument("layout_files", nargs="+", help=".layout_table files")
+    parser.add_argument(
+        "--view",
+        action="append",
+        dest="views",
+        help=f"Camera preset, optionally with overrides like `top:scale=40`. "
+        f"Presets: {', '.join(CAMERA_PRESETS)}. May be repeated (default: perspective)",
+    )
+    parser.add_argument("--output-dir", default=".", help="Output directory")
+    parser.add_argument(
+        "--resolution", type=int, nargs=2, default=(1920, 1080), metavar=("X", "Y")
+    )
+    parser.add_argument("--engine", default="CYCLES", help="Render engine")
+    parser.add_argument("--samples", type=int, default=32, help="Cycles samples")
+    parser.add_argument(
+        "--save-blend", action="store_true", help="Also save the scene as .blend"
+    )
+    parser.add_argument(
+        "--no-center", action="store_true", help="Do not recenter the lattice"
+    )
+    parser.add_argument(
+        "--catalogue", default=None, help="Directory of 3DMODEL .blend files"
+    )
+    parser.add_argument(
+        "--cutaway",
+        default=None,
+        choices=list(lattice.CUTAWAY_WEDGE),
+        help="Cutaway view of procedural elements",
+    )
+    parser.add_argument(
+        "--mesh-cache",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="Reuse element meshes from an on-disk cache "
+        "(default dir: $BPY_LATTICE_CACHE or ~/.cache/bpy_lattice/meshes)",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="Write a JSON build timing summary"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="Write cProfile stats of each build"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Enable verbose logging")
+    return parser
+
+
+def render_entrypoint(argv: Optional[List[str]] = None):
+    """
+    Entry point for headless batch rendering of lattice tables.
+    """
+    args = render_parser().parse_args(script_args(argv))
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    views = args.views or ["perspective"]
+    mesh_cache = None
+    if args.mesh_cache is not None:
+        mesh_cache = MeshCache(args.mesh_cache or None)
+    for file in args.layout_files:
+        outputs = render_layout(
+            file,
+            views,
+            output_dir=args.output_dir,
+            resolution=tuple(args.resolution),
+            engine=args.engine,
+            samples=args.samples,
+            save_blend=args.save_blend,
+            center=not args.no_center,
+            use_real_model=args.catalogue is not None,
+            catalogue=args.catalogue,
+            cutaway=args.cutaway,
+            mesh_cache=mesh_cache,
+            stats=args.stats,
+            profile=args.profile,
+        )
+        for f in outputs:
+            print("Wrote: ", f)
+
+
+if __name__ == "__main__":
+    render_entrypoint()
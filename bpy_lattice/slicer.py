@@ -1,17 +1,24 @@
+import logging
+
 import bpy
+import numpy as np
+
+from mathutils import Matrix, Vector
+
+from bpy_lattice import profiling
+from bpy_lattice.mesh import mesh_from_arrays
 
-from mathutils import Matrix
+logger = logging.getLogger(__name__)
 
 
 def slice_object(object, punch, use_ops_method=False):
     if object.type != "MESH":
         return
-    print("slicing", object.name, "with", punch.name)
+    logger.debug("slicing %s with %s", object.name, punch.name)
     if object == punch:
-        print(object.name, punch.name)
         return
     if object.data.users > 1:
-        print(object.name, " data already has users, skipping slice")
+        logger.info("%s data already has users, skipping slice", object.name)
         return
     object.modifiers.new("cut", type="BOOLEAN")
     object.modifiers["cut"].operation = "DIFFERENCE"
@@ -26,11 +33,10 @@ def slice_object(object, punch, use_ops_method=False):
     # new_mesh = object.to_mesh(scene=bpy.context.scene, apply_modifiers=True, settings='PREVIEW')
     new_mesh = object.to_mesh()
 
-    print("sliced number of vertices: ", len(new_mesh.vertices))
+    logger.debug("sliced number of vertices: %d", len(new_mesh.vertices))
     object.data = new_mesh
 
     # Cleanup
-    print("cleaning up")
     object.modifiers.clear()
     bpy.data.meshes.remove(old_mesh)
 
@@ -38,6 +44,242 @@ def slice_object(object, punch, use_ops_method=False):
     # object.name = name
 
 
+def bounding_box(object):
+    """
+    World-space axis-aligned bounding box of an object.
+
+    Returns
+    -------
+    lo, hi: np.ndarray
+        Minimum and maximum corners, each of shape (3,)
+    """
+    corners = np.array([(object.matrix_world @ Vector(c))[:] for c in object.bound_box])
+    return corners.min(axis=0), corners.max(axis=0)
+
+
+def bbox_overlap(a, b, pad=0.0):
+    """
+    True if the world-space bounding boxes of objects a and b overlap.
+    """
+    alo, ahi = bounding_box(a)
+    blo, bhi = bounding_box(b)
+    return bool(np.all(alo <= bhi + pad) and np.all(blo <= ahi + pad))
+
+
+def objects_intersecting(objects, punch, pad=0.0):
+    """
+    Cull a list of objects to the meshes whose bounding box overlaps the punch.
+
+    The punch bounding box is computed once, so this is a cheap
+    O(objects) pass that avoids building boolean modifiers for
+    objects that cannot be cut.
+    """
+    plo, phi = bounding_box(punch)
+    hits = []
+    for o in objects:
+        if o == punch or o.type != "MESH":
+            continue
+        lo, hi = bounding_box(o)
+        if np.all(lo <= phi + pad) and np.all(plo <= hi + pad):
+            hits.append(o)
+    return hits
+
+
+def join_by_material(objects, name_suffix="_joined"):
+    """
+    Join mesh objects into one world-space mesh per material.
+
+    The input objects are removed from the file and replaced by a
+    single object for each distinct (first) material. Objects without
+    a material are joined together into an object named `unassigned`.
+
+    Children of removed objects that are not joined themselves (e.g.
+    non-mesh children, or CAD children not in objects) are unparented,
+    keeping their world transform.
+
+    Returns
+    -------
+    joined: list of bpy.types.Object
+    """
+    groups = {}
+    for o in objects:
+        if o.type != "MESH":
+            continue
+        mat = o.active_material
+        groups.setdefault(mat, []).append(o)
+
+    removed = {o for group in groups.values() for o in group}
+    for o in removed:
+        for child in o.children:
+            if child not in removed:
+                _unparent(child)
+
+    collection = bpy.context.collection
+    joined = []
+    for mat, group in groups.items():
+        name = (mat.name if mat else "unassigned") + name_suffix
+        mesh = _joined_mesh(name, group)
+        if mat:
+            mesh.materials.append(mat)
+        ob = bpy.data.objects.new(name, mesh)
+        collection.objects.link(ob)
+        joined.append(ob)
+        for o in group:
+            bpy.data.objects.remove(o)
+    return joined
+
+
+def _unparent(object):
+    """
+    Clear the parent of object, keeping its world transform
+    """
+    world = object.parent.matrix_world @ object.matrix_parent_inverse
+    world = world @ object.matrix_basis
+    object.parent = None
+    object.matrix_world = world
+
+
+def _joined_mesh(name, objects):
+    """
+    Concatenate the world-space geometry of objects into a single new mesh.
+    """
+    cos, loop_verts, loop_totals = [], [], []
+    offset = 0
+    for o in objects:
+        me = o.data
+        nv = len(me.vertices)
+        co = np.empty(nv * 3, dtype=np.float32)
+        me.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3)
+        m = np.array(o.matrix_world)
+        co = co @ m[:3, :3].T + m[:3, 3]
+        lv = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get("vertex_index", lv)
+        lt = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get("loop_total", lt)
+        cos.append(co)
+        loop_verts.append(lv + offset)
+        loop_totals.append(lt)
+        offset += nv
+
+    co = np.concatenate(cos) if cos else np.zeros((0, 3))
+    lv = np.concatenate(loop_verts) if loop_verts else np.zeros(0, dtype=np.int32)
+    lt = np.concatenate(loop_totals) if loop_totals else np.zeros(0, dtype=np.int32)
+    mesh = mesh_from_arrays(name, co, lv, lt)
+    mesh.validate()
+    return mesh
+
+
+def apply_cut(object, punch):
+    """
+    Cut object with a single BOOLEAN DIFFERENCE and bake the result.
+
+    The evaluated mesh is copied from the dependency graph, so this
+    works without changing the active object or calling operators.
+    """
+    with profiling.stage("slice"):
+        mod = object.modifiers.new("cut", type="BOOLEAN")
+        mod.operation = "DIFFERENCE"
+        mod.object = punch
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        old_mesh = object.data
+        new_mesh = bpy.data.meshes.new_from_object(object.evaluated_get(depsgraph))
+        object.modifiers.remove(mod)
+    profiling.count("sliced")
+    object.data = new_mesh
+    if old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+    return object
+
+
+def slice_objects(objects, punch, join=False, pad=0.0):
+    """
+    Cutaway engine: slice many objects with one stationary punch.
+
+    Objects are first culled by bounding-box overlap with the punch.
+    If join is True, the intersecting objects are merged into one mesh
+    per material so that the whole cutaway needs only one boolean
+    pass per material. Otherwise each intersecting object is cut
+    separately. Objects whose mesh data is shared are skipped,
+    as in `slice_object`.
+
+    Parameters
+    ----------
+    objects: list of bpy.types.Object
+        Candidates to cut. Non-mesh objects are ignored.
+    punch: bpy.types.Object
+        The cutter. It is not moved.
+    join: bool, optional
+        Join intersecting objects per material before cutting.
+        Default: False
+    pad: float, optional
+        Extra margin for the bounding-box test.
+
+    Returns
+    -------
+    sliced: list of bpy.types.Object
+        The objects that were cut.
+    """
+    hits = objects_intersecting(objects, punch, pad=pad)
+    logger.info("slicing %d of %d objects with %s", len(hits), len(objects), punch.name)
+    if join:
+        hits = [o for o in hits if o.data.users == 1]
+        hits = join_by_material(hits)
+    sliced = []
+    for o in hits:
+        if o.data.users > 1:
+            continue
+        sliced.append(apply_cut(o, punch))
+    return sliced
+
+
+def cutaway_punch(objects, z=0.0, pad=1.0):
+    """
+    Make a box punch that removes everything above height z
+    over the full extent of objects.
+
+    This replaces moving a small punch from object to object.
+    """
+    los, his = zip(*(bounding_box(o) for o in objects))
+    lo = np.min(los, axis=0) - pad
+    hi = np.max(his, axis=0) + pad
+    lo[2] = z
+    center = (lo + hi) / 2
+    bpy.ops.mesh.primitive_cube_add(location=center[:])
+    punch = bpy.context.view_layer.objects.active
+    punch.name = "cutaway_punch"
+    half = (hi - lo) / 2
+    for v in punch.data.vertices:
+        v.co = Vector((v.co.x * half[0], v.co.y * half[1], v.co.z * half[2]))
+    punch.hide_render = True
+    punch.display_type = "WIRE"
+    return punch
+
+
+def wedge_punch(a0, a1, size=100.0):
+    """
+    Make a punch covering the transverse wedge between angles a0 and a1
+    (measured from +y toward +z, with a1 - a0 <= pi) in its local frame.
+    """
+    from math import cos, sin
+
+    mid = (a0 + a1) / 2
+    ring = [(0.0, 0.0), (size * cos(a0), size * sin(a0))]
+    ring += [(2 * size * cos(mid), 2 * size * sin(mid))]
+    ring += [(size * cos(a1), size * sin(a1))]
+    n = len(ring)
+    verts = [(-size, y, z) for y, z in ring] + [(size, y, z) for y, z in ring]
+    faces = [(j, (j + 1) % n, n + (j + 1) % n, n + j) for j in range(n)]
+    faces += [tuple(reversed(range(n))), tuple(range(n, 2 * n))]
+    mesh = bpy.data.meshes.new("wedge_punch")
+    mesh.from_pydata(verts, [], faces)
+    mesh.update(calc_edges=True)
+    punch = bpy.data.objects.new("wedge_punch", mesh)
+    bpy.context.collection.objects.link(punch)
+    punch.hide_render = True
+    return punch
+
+
 def cube_slicer(location=(0, 0, 0)):
     bpy.ops.mesh.primitive_cube_add(location=location)
     punch = bpy.context.view_layer.objects.active
@@ -48,26 +290,14 @@ def cube_slicer(location=(0, 0, 0)):
     mat = Matrix([[5, 0, 0], [0, 1, 0], [0, 0, 1]])
     for v in punch.data.vertices:
         v.co = mat @ v.co
-    print("punch.name = ", punch.name)
     return punch
 
 
-def slice_all():
-    i = 1
+def slice_all(join=False):
     punch = cube_slicer(location=(0, 0, 1))
-    imax = len(bpy.data.objects)
-    olist = [o for o in bpy.data.objects]
-    # myo = bpy.context.scene.objects.active
-    # olist = [o for o in bpy.data.objects]
-    # olist = [myo]
-    for o in olist:
-        if o == punch:
-            continue
-        print(o.name, i, "/", imax)
-        slice_object(o, punch)
-        i = i + 1
-    bpy.context.scene.objects.active = punch
-    bpy.ops.object.delete()
+    olist = [o for o in bpy.data.objects if o != punch]
+    slice_objects(olist, punch, join=join)
+    bpy.data.objects.remove(punch)
 
 
 if __name__ == "__main__":
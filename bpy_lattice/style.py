@@ -0,0 +1,232 @@
+"""
+Drawing style: transverse scale, color and section shape of each element key.
+
+A Style is immutable and validated when created. Variants are made with
+`replace`, which merges per-key settings:
+
+    style = Style().replace(scale_factor=3, x_scale={"LCAVITY": 0.1})
+    objects = lattice.ele_objects(eles, style=style)
+
+For a build, the style is resolved once into a StyleTable with one row per
+element key, so that per-element lookups are array indexing:
+
+    table = style.resolve(ele.key for ele in eles)
+    idx = table.indices(eles)
+    scales = table.scale[idx]
+"""
+
+import hashlib
+import logging
+from dataclasses import astuple, dataclass, field, fields
+from functools import lru_cache
+from math import isfinite
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+import numpy as np
+
+from .constants import ELE_COLOR, ELE_X_SCALE, ELE_X_SCALE_FACTOR
+
+logger = logging.getLogger(__name__)
+
+# Cross-section shapes, see geometry.ele_section
+SECTION_TYPES = ("ellipse", "box", "quadrupole", "sextupole", "wiggler", "bend", "pipe")
+
+ELE_SECTION = {
+    "QUADRUPOLE": "quadrupole",
+    "SEXTUPOLE": "sextupole",
+    "WIGGLER": "wiggler",
+    "SBEND": "bend",
+    "PIPE": "pipe",
+}
+
+
+class ElementStyle(NamedTuple):
+    """
+    Resolved style of one element key
+    """
+
+    scale: float
+    color: Tuple[float, float, float]
+    section: str
+
+
+def _items(mapping) -> Tuple[tuple, ...]:
+    """
+    Hashable, ordered form of a key -> value mapping
+    """
+    upper = {str(k).upper(): v for k, v in dict(mapping).items()}
+    return tuple(sorted(upper.items()))
+
+
+def _check_scale(name, value):
+    if not isinstance(value, (int, float)) or not isfinite(value) or value <= 0:
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    return float(value)
+
+
+def _check_color(name, value):
+    try:
+        color = tuple(float(c) for c in value)
+    except (TypeError, ValueError):
+        color = ()
+    if len(color) != 3 or not all(0 <= c <= 1 for c in color):
+        raise ValueError(f"{name} must be an (r, g, b) tuple in [0, 1], got {value!r}")
+    return color
+
+
+def _check_section(name, value):
+    if value not in SECTION_TYPES:
+        raise ValueError(f"{name} must be one of {SECTION_TYPES}, got {value!r}")
+    return value
+
+
+@dataclass(frozen=True)
+class Style:
+    """
+    Immutable drawing style.
+
+    Parameters
+    ----------
+    scale_factor: float
+        Overall transverse scale
+    x_scale: dict
+        Element key -> relative transverse scale
+    colors: dict
+        Element key -> (r, g, b) in [0, 1]
+    sections: dict
+        Element key -> section type, see SECTION_TYPES
+    default_scale, default_color, default_section:
+        Used for keys missing from the dicts above
+    smooth: bool
+        Smooth shading with custom normals, see geometry.loop_normals.
+        Caps and sharp corners stay flat.
+
+    Raises
+    ------
+    ValueError
+        If any value is invalid
+    """
+
+    scale_factor: float = ELE_X_SCALE_FACTOR
+    x_scale: Tuple[Tuple[str, float], ...] = field(default_factory=lambda: ELE_X_SCALE)
+    colors: Tuple[Tuple[str, tuple], ...] = field(default_factory=lambda: ELE_COLOR)
+    sections: Tuple[Tuple[str, str], ...] = field(default_factory=lambda: ELE_SECTION)
+    default_scale: float = 1.0
+    default_color: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+    default_section: str = "ellipse"
+    smooth: bool = False
+
+    def __post_init__(self):
+        # Normalize mappings to sorted tuples, so that styles are hashable
+        # and compare equal regardless of insertion order
+        checked = {
+            "scale_factor": _check_scale("scale_factor", self.scale_factor),
+            "x_scale": tuple(
+                (k, _check_scale(f"x_scale[{k!r}]", v)) for k, v in _items(self.x_scale)
+            ),
+            "colors": tuple(
+                (k, _check_color(f"colors[{k!r}]", v)) for k, v in _items(self.colors)
+            ),
+            "sections": tuple(
+                (k, _check_section(f"sections[{k!r}]", v))
+                for k, v in _items(self.sections)
+            ),
+            "default_scale": _check_scale("default_scale", self.default_scale),
+            "default_color": _check_color("default_color", self.default_color),
+            "default_section": _check_section("default_section", self.default_section),
+            "smooth": bool(self.smooth),
+        }
+        for name, value in checked.items():
+            object.__setattr__(self, name, value)
+
+    def replace(self, **changes) -> "Style":
+        """
+        New style with changes. Dict fields are merged with the current ones.
+        """
+        for name in ("x_scale", "colors", "sections"):
+            if name in changes:
+                changes[name] = {**dict(getattr(self, name)), **changes[name]}
+        values = {f.name: getattr(self, f.name) for f in fields(self)}
+        values.update(changes)
+        return Style(**values)
+
+    def cache_key(self) -> str:
+        """
+        Stable hash of the style, for caching derived data across sessions
+        """
+        return hashlib.sha256(repr(astuple(self)).encode()).hexdigest()
+
+    def resolve(self, keys: Iterable[str]) -> "StyleTable":
+        """
+        Dense table of the style of each distinct key.
+
+        Keys without a scale are warned about once per style.
+        """
+        return _resolve(self, tuple(sorted(set(keys))))
+
+    def lookup(self, key: str) -> ElementStyle:
+        """
+        Style of a single element key
+        """
+        return self.resolve((key,)).rows[0]
+
+
+@lru_cache(maxsize=None)
+def _warn_missing(style: Style, key: str):
+    logger.warning("missing %s in x_scale, using default_scale", key)
+
+
+@lru_cache(maxsize=64)
+def _resolve(style: Style, keys: Tuple[str, ...]) -> "StyleTable":
+    x_scale = dict(style.x_scale)
+    colors = dict(style.colors)
+    sections = dict(style.sections)
+    for key in keys:
+        if key not in x_scale:
+            _warn_missing(style, key)
+    scale = np.array([x_scale.get(k, style.default_scale) for k in keys], dtype=float)
+    scale *= style.scale_factor
+    color = np.array([colors.get(k, style.default_color) for k in keys], dtype=float)
+    color = color.reshape(len(keys), 3)
+    section = tuple(sections.get(k, style.default_section) for k in keys)
+    scale.flags.writeable = color.flags.writeable = False
+    return StyleTable(
+        keys=keys,
+        index={k: i for i, k in enumerate(keys)},
+        scale=scale,
+        color=color,
+        section=section,
+        rows=tuple(
+            ElementStyle(float(s), tuple(c.tolist()), t)
+            for s, c, t in zip(scale, color, section)
+        ),
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class StyleTable:
+    """
+    Resolved style, one row per element key.
+
+    scale: np.ndarray of shape (n_keys,)
+        Transverse scale, including Style.scale_factor
+    color: np.ndarray of shape (n_keys, 3)
+    section: tuple of section types
+    rows: tuple of ElementStyle, the same by row
+    """
+
+    keys: Tuple[str, ...]
+    index: Dict[str, int]
+    scale: np.ndarray
+    color: np.ndarray
+    section: Tuple[str, ...]
+    rows: Tuple[ElementStyle, ...]
+
+    def indices(self, eles) -> np.ndarray:
+        """
+        Row index of each element
+        """
+        return np.fromiter((self.index[ele.key] for ele in eles), int)
+
+
+DEFAULT_STYLE = Style()
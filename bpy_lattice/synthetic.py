@@ -0,0 +1,245 @@
+"""
+Synthetic lattices for testing and benchmarking at arbitrary scale.
+
+Elements are placed along a reference orbit in the Bmad floor frame, as in
+a `.layout_table` written by Tao: positions are element centers, and theta
+is the heading in the horizontal (z, x) plane.
+
+Example
+-------
+    eles = fodo_ring(10_000, model_every=10)
+    write_layout_table(eles, "ring.layout_table")
+    write_orbit(eles, "ring_orbit.dat")
+"""
+
+from math import ceil, cos, pi, sin
+from typing import List
+
+import numpy as np
+
+from .elements import Element, Pipe, SBend
+from .interfaces.bmad import HEADER
+
+# CAD model tag, see lattice.blendfile
+MODEL_TAG = "3DMODEL={}.blend"
+
+
+class _Walker:
+    """
+    Places elements one after the other along the reference orbit
+    """
+
+    def __init__(self):
+        self.x = 0.0
+        self.z = 0.0
+        self.theta = 0.0
+        self.eles = []
+
+    def _advance(self, s, k):
+        """
+        Position after length s with curvature k (bending toward -x for k > 0)
+        """
+        t0 = self.theta
+        if abs(k) < 1e-12:
+            return self.x + s * sin(t0), self.z + s * cos(t0), t0
+        t1 = t0 - k * s
+        return (
+            self.x + (cos(t1) - cos(t0)) / k,
+            self.z - (sin(t1) - sin(t0)) / k,
+            t1,
+        )
+
+    def add(self, cls=Element, key="DRIFT", L=1.0, angle=0.0, descrip="", **kw):
+        k = angle / L if L else 0.0
+        x, z, theta = self._advance(L / 2, k)
+        name = f"{key[0]}{len(self.eles) + 1}"
+        if cls is SBend:
+            kw.update(angle=angle)
+        self.eles.append(
+            cls(
+                name=name,
+                index=len(self.eles) + 1,
+                x=x,
+                z=z,
+                theta=theta,
+                key=key,
+                L=L,
+                descrip=descrip,
+                **kw,
+            )
+        )
+        self.x, self.z, self.theta = self._advance(L, k)
+
+
+def _drift(w, L, pipes):
+    if pipes:
+        w.add(Pipe, "PIPE", L, radius_x=0.02, radius_y=0.02, thickness=0.002)
+    else:
+        w.add(Element, "DRIFT", L)
+
+
+def fodo_ring(
+    n_elements: int = 1000,
+    cell_length: float = 10.0,
+    quad_length: float = 0.5,
+    bend_length: float = 2.0,
+    model_every: int = 0,
+    pipes: bool = True,
+) -> List[Element]:
+    """
+    Closed ring of FODO cells: QF, drift, bend, drift, QD, drift, bend, drift.
+
+    Parameters
+    ----------
+    n_elements: int
+        Approximate number of elements, rounded up to whole cells
+    model_every: int
+        If > 0, every model_every-th quadrupole gets a 3DMODEL tag
+    pipes: bool
+        Use PIPE elements for the drifts
+
+    Returns
+    -------
+    eles: list of Element
+    """
+    n_cells = max(ceil(n_elements / 8), 1)
+    angle = 2 * pi / (2 * n_cells)
+    drift = (cell_length - 2 * quad_length - 2 * bend_length) / 4
+    w = _Walker()
+    n_quads = 0
+    for _ in range(n_cells):
+        for _ in range(2):
+            n_quads += 1
+            tag = ""
+            if model_every and n_quads % model_every == 0:
+                tag = MODEL_TAG.format("quadrupole")
+            w.add(Element, "QUADRUPOLE", quad_length, descrip=tag)
+            _drift(w, drift, pipes)
+            w.add(SBend, "SBEND", bend_length, angle=angle)
+            _drift(w, drift, pipes)
+    return w.eles
+
+
+def linac(
+    n_elements: int = 1000,
+    cavity_length: float = 1.0,
+    quad_length: float = 0.3,
+    dogleg_every: int = 10,
+    dogleg_angle: float = 0.1,
+    model_every: int = 0,
+    pipes: bool = True,
+) -> List[Element]:
+    """
+    Linac of cavity/quadrupole cells. Every dogleg_every cells a drift is
+    replaced by a bend, alternating in sign so the line stays straight on
+    average.
+
+    Parameters
+    ----------
+    n_elements: int
+        Approximate number of elements, rounded up to whole cells
+    model_every: int
+        If > 0, every model_every-th cavity gets a 3DMODEL tag
+    pipes: bool
+        Use PIPE elements for the drifts
+
+    Returns
+    -------
+    eles: list of Element
+    """
+    n_cells = max(ceil(n_elements / 4), 1)
+    w = _Walker()
+    for i in range(n_cells):
+        tag = ""
+        if model_every and (i + 1) % model_every == 0:
+            tag = MODEL_TAG.format("cavity")
+        w.add(Element, "LCAVITY", cavity_length, descrip=tag)
+        _drift(w, 0.2, pipes)
+        w.add(Element, "QUADRUPOLE", quad_length)
+        if dogleg_every and (i + 1) % dogleg_every == 0:
+            sign = 1 if (i + 1) // dogleg_every % 2 else -1
+            w.add(SBend, "SBEND", 0.5, angle=sign * dogleg_angle)
+        else:
+            _drift(w, 0.2, pipes)
+    return w.eles
+
+
+def _customs(ele: Element):
+    if isinstance(ele, SBend):
+        return ele.angle, ele.e1, ele.e2
+    if isinstance(ele, Pipe):
+        return ele.radius_x, ele.radius_y, ele.thickness
+    return 0, 0, 0
+
+
+def write_layout_table(eles: List[Element], file: str):
+    """
+    Write elements as a `.layout_table`, readable by lattice.import_lattice.
+
+    Elements with more than one pass get a 15th column with the number of
+    passes.
+    """
+    with open(file, "w") as f:
+        f.write(HEADER + "\n")
+        for ele in eles:
+            c1, c2, c3 = _customs(ele)
+            f.write(
+                f"{ele.name}, {ele.index}, {ele.x:.8E}, {ele.y:.8E}, {ele.z:.8E}, "
+                f"{ele.theta:.8E}, {ele.phi:.8E}, {ele.psi:.8E}, {ele.key}, "
+                f"{ele.L:.8E}, {c1:.8E}, {c2:.8E}, {c3:.8E}, {ele.descrip}"
+            )
+            f.write(f", {ele.passes}\n" if ele.passes > 1 else "\n")
+    return file
+
+
+def write_orbit(
+    eles: List[Element],
+    file: str,
+    points_per_element: int = 1,
+    amplitude: float = 1e-3,
+    e_tot: float = 150e6,
+):
+    """
+    Write an orbit file for orbit.import_orbit, following the element centers
+    with a small betatron-like oscillation.
+
+    Columns are x, px, y, py, z, pz (floor frame, with p the unit direction),
+    t, e_tot, s, two unused columns, beta_a, eta_x, beta_b, eta_y.
+    """
+    x = np.array([ele.x for ele in eles])
+    z = np.array([ele.z for ele in eles])
+    theta = np.array([ele.theta for ele in eles])
+    L = np.array([ele.L for ele in eles])
+    s = np.cumsum(L) - L / 2
+    if points_per_element > 1:
+        idx = np.arange(len(eles))
+        fine = np.linspace(0, len(eles) - 1, (len(eles) - 1) * points_per_element + 1)
+        x, z, theta, s = (np.interp(fine, idx, a) for a in (x, z, theta, s))
+    wobble = amplitude * np.sin(2 * pi * s / 20)
+    x = x + wobble * np.cos(theta)
+    z = z - wobble * np.sin(theta)
+    n = len(s)
+    cols = np.column_stack(
+        [
+            x,
+            np.sin(theta),
+            np.zeros(n),
+            np.zeros(n),
+            z,
+            np.cos(theta),
+            s / 299792458.0,
+            np.full(n, e_tot),
+            s,
+            np.zeros(n),
+            np.zeros(n),
+            10 + 5 * np.cos(2 * pi * s / 10),
+            np.zeros(n),
+            10 + 5 * np.sin(2 * pi * s / 10),
+            np.zeros(n),
+        ]
+    )
+    with open(file, "w") as f:
+        f.write("# Synthetic orbit\n")
+        f.write("# x px y py z pz t e_tot s - - beta_a eta_x beta_b eta_y\n")
+        np.savetxt(f, cols, fmt="%.10e")
+    return file
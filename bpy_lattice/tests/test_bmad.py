@@ -0,0 +1,76 @@
+import numpy as np
+
+from bpy_lattice.elements import SBend, map_table_element
+from bpy_lattice.interfaces.bmad import elements_from_tao, write_bpy_lattice_csv
+
+
+class FakeTao:
+    """
+    The parts of the pytao.Tao interface used by interfaces.bmad
+    """
+
+    ELES = {
+        0: ("BEGINNING", "Beginning_Ele", {"L": 0}),
+        1: ("D1", "Drift", {"L": 1.5}),
+        2: ("B1", "Sbend", {"L": 1.0, "ANGLE": 0.1, "E1": 0.01, "E2": 0.02}),
+        3: ("P1", "Pipe", {"L": 0.5, "X1_LIMIT": 0.01, "Y1_LIMIT": 0.02}),
+    }
+
+    def lat_list(self, match, who, flags=""):
+        return list(self.ELES)
+
+    def ele_head(self, ele_id):
+        name, key, _ = self.ELES[ele_id]
+        return {"name": name, "key": key, "ix_ele": ele_id, "descrip": '""'}
+
+    def ele_floor(self, ele_id, where="center"):
+        return {"Actual": np.array([0.1 * ele_id, 0, ele_id, 0.01 * ele_id, 0, 0])}
+
+    def ele_gen_attribs(self, ele_id):
+        return self.ELES[ele_id][2]
+
+
+def test_elements_from_tao(tmp_path):
+    tao = FakeTao()
+    outfile = tmp_path / "lat.layout_table"
+    eles = list(elements_from_tao(tao, outfile=str(outfile)))
+    assert [ele.name for ele in eles] == ["D1", "B1", "P1"]
+    assert isinstance(eles[1], SBend) and eles[1].e2 == 0.02
+    assert eles[2].radius_y == 0.02
+
+    # Same as going through the text file
+    csv = tmp_path / "csv.layout_table"
+    write_bpy_lattice_csv(tao, str(csv))
+    assert csv.read_text() == outfile.read_text()
+    lines = csv.read_text().splitlines()[1:]
+    assert [map_table_element(line) for line in lines] == eles
+
+
+class MultipassTao(FakeTao):
+    """
+    Two passes through Q1, listed as slaves
+    """
+
+    ELES = {
+        **FakeTao.ELES,
+        4: ("Q1\\1", "Quadrupole", {"L": 0.3}),
+        5: ("Q1\\2", "Quadrupole", {"L": 0.3}),
+    }
+
+    def ele_floor(self, ele_id, where="center"):
+        return super().ele_floor(min(ele_id, 4), where)
+
+
+def test_multipass_from_tao(tmp_path):
+    tao = MultipassTao()
+    outfile = tmp_path / "lat.layout_table"
+    eles = list(elements_from_tao(tao, outfile=str(outfile)))
+    assert [(ele.name, ele.passes) for ele in eles][-2:] == [("P1", 1), ("Q1", 2)]
+    assert len(list(elements_from_tao(tao, dedupe=False))) == 5
+
+    csv = tmp_path / "csv.layout_table"
+    write_bpy_lattice_csv(tao, str(csv))
+    assert csv.read_text() == outfile.read_text()
+    lines = csv.read_text().splitlines()[1:]
+    assert lines[-1].endswith(", 2")
+    assert [map_table_element(line) for line in lines] == eles
@@ -0,0 +1,61 @@
+import bpy
+import numpy as np
+import pytest
+from bpy_extras.object_utils import world_to_camera_view
+from mathutils import Vector
+
+from bpy_lattice import camera, synthetic
+from bpy_lattice.bounds import LatticeBounds
+from bpy_lattice.elements import Element
+from bpy_lattice.lattice import lat_borders
+
+
+def test_lattice_bounds():
+    eles = synthetic.fodo_ring(80)
+    bounds = LatticeBounds(eles, origin=(1, 2, 3))
+    lo, hi = bounds.aabb()
+    assert np.all(bounds.centers >= lo) and np.all(bounds.centers <= hi)
+    # Blender x is Bmad z, shifted by the origin
+    assert lo[0] < lat_borders(eles, "z")[0] - 1 < hi[0]
+
+    quads = bounds.select(names="Q*")
+    assert quads.sum() == 20
+    assert bounds.select(names=["Q1", "S3"]).sum() == 2
+    assert bounds.select(start=5, end=8).sum() == 4
+    assert bounds.select(start="S3", end="S7").sum() == 5
+    with pytest.raises(ValueError):
+        bounds.aabb(bounds.select(names="nothing"))
+
+
+def test_oriented_bounds():
+    # A straight line at 30 degrees
+    theta = np.pi / 6
+    eles = [
+        Element(
+            name=f"D{i}",
+            key="DRIFT",
+            L=1,
+            x=i * np.sin(theta),
+            z=i * np.cos(theta),
+            theta=theta,
+        )
+        for i in range(10)
+    ]
+    center, axes, half = LatticeBounds(eles).obb()
+    assert abs(axes[0] @ [np.cos(theta), np.sin(theta), 0]) == pytest.approx(1)
+    assert 5 <= half[0] < 6
+    assert half[1] < 1
+
+
+@pytest.mark.parametrize("view", ["top", "perspective"])
+@pytest.mark.parametrize("oriented", [False, True])
+def test_frame_bounds(view, oriented):
+    scene = bpy.context.scene
+    scene.render.resolution_x, scene.render.resolution_y = 160, 90
+    bounds = LatticeBounds(synthetic.linac(200, dogleg_every=5))
+    which = bounds.select(start=20, end=120)
+    cam = camera.frame_bounds(bounds, view=view, start=20, end=120, oriented=oriented)
+    bpy.context.view_layer.update()
+    for p in bounds.corners(which):
+        u, v, depth = world_to_camera_view(scene, cam, Vector(p))
+        assert 0 <= u <= 1 and 0 <= v <= 1 and depth > 0
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from bpy_lattice import geometry, lattice
+from bpy_lattice.cache import MeshCache
+
+LAYOUT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "examples", "bmad", "lat.layout_table"
+)
+
+
+def test_mesh_cache(tmp_path):
+    eles = lattice.import_lattice(LAYOUT)
+    cache = MeshCache(str(tmp_path))
+    first = lattice.ele_objects(eles, mesh_cache=cache)
+    assert cache.hits + cache.misses == len(first)
+    assert cache.misses > 0
+
+    # One bundle file, read in a new session
+    assert len(os.listdir(tmp_path)) == 1
+    cache = MeshCache(str(tmp_path))
+    second = lattice.ele_objects(eles, mesh_cache=cache)
+    assert cache.misses == 0
+    assert cache.hits == len(second)
+    for a, b in zip(first, second):
+        assert len(a.data.vertices) == len(b.data.vertices)
+        assert len(a.data.polygons) == len(b.data.polygons)
+
+
+def test_mesh_cache_eviction(tmp_path):
+    eles = list(geometry.drawn_elements(lattice.import_lattice(LAYOUT)))
+    cache = MeshCache(str(tmp_path), max_bytes=0)
+    for ele in eles:
+        cache.mesh_arrays(ele, 1.0)
+    cache.save()
+    assert os.listdir(tmp_path) == []
+
+    with MeshCache(str(tmp_path)) as cache:
+        cache.mesh_arrays(eles[0], 1.0)
+    assert len(os.listdir(tmp_path)) == 1
+    cache.clear()
+    assert os.listdir(tmp_path) == []
+
+
+def test_mesh_cache_bundle(tmp_path):
+    arrays = (np.zeros((100, 3)), np.zeros(8, np.int32), np.zeros(2, np.int32))
+    with MeshCache(str(tmp_path), max_bytes=7_500) as cache:
+        for i in range(20):
+            cache.put(f"k{i}", i + arrays[0], *arrays[1:])
+        cache.get("k0")  # Recently used
+    # Each entry is ~2.4 kB: the three most recently used are kept
+    assert sorted(cache.entries) == ["k0", "k18", "k19"]
+    assert cache.total <= cache.max_bytes
+
+    # Entries saved by another process are merged
+    with MeshCache(str(tmp_path), max_bytes=7_500) as other:
+        other.put("other", *arrays)
+    cache.put("k20", *arrays)
+    cache.save()
+    cache = MeshCache(str(tmp_path), max_bytes=7_500)
+    assert sorted(cache._read()) == ["k0", "k20", "other"]
+    verts, loop_vertices, loop_totals = cache.get("k0")
+    assert verts.shape == (100, 3) and verts[0, 0] == 0
+    assert loop_vertices.dtype == np.int32 and len(loop_totals) == 2
+    assert cache.get("k19") is None
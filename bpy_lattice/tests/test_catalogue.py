@@ -0,0 +1,145 @@
+import gzip
+import os
+import shutil
+import threading
+
+import bpy
+import numpy as np
+
+from bpy_lattice import lattice
+from bpy_lattice.catalogue import ModelPrefetcher, compression
+from bpy_lattice.elements import Element
+
+
+def make_catalogue(path):
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    mesh = bpy.data.meshes.new("cube")
+    # Box along x, centred on the axis
+    vertices = [(x, y, z) for x in (0, 2) for y in (-0.5, 0.5) for z in (-0.5, 0.5)]
+    faces = [
+        (0, 1, 3, 2),
+        (4, 6, 7, 5),
+        (0, 4, 5, 1),
+        (2, 3, 7, 6),
+        (0, 2, 6, 4),
+        (1, 5, 7, 3),
+    ]
+    mesh.from_pydata(vertices, [], faces)
+    bpy.context.collection.objects.link(bpy.data.objects.new("cube", mesh))
+    plain = str(path / "plain.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=plain, copy=True, compress=False)
+    with open(plain, "rb") as f, gzip.open(path / "packed.blend", "wb") as g:
+        shutil.copyfileobj(f, g)
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+
+
+def test_model_prefetcher(tmp_path):
+    catalogue = tmp_path / "models"
+    catalogue.mkdir()
+    make_catalogue(catalogue)
+    assert compression(catalogue / "packed.blend") == "gzip"
+    assert compression(catalogue / "plain.blend") is None
+
+    eles = [
+        Element(name=f"E{i}", index=i, L=1, descrip=f"3DMODEL={model}.blend")
+        for i, model in enumerate(["plain", "packed", "packed", "absent"])
+    ]
+    cache = str(tmp_path / "cache")
+    with ModelPrefetcher(str(catalogue), cache, decompress=True) as prefetcher:
+        assert prefetcher.start(eles) == ["packed.blend", "plain.blend"]
+        assert prefetcher.missing == ["absent.blend"]
+        # Object names are indexed before the build
+        assert prefetcher.objects("packed.blend") == {"cube": {}}
+        assert prefetcher.path("absent.blend") is None
+        assert prefetcher.path("plain.blend") == str(catalogue / "plain.blend")
+        packed = prefetcher.path("packed.blend")
+        assert os.path.dirname(packed) == cache
+        assert compression(packed) is None
+
+        objects = lattice.ele_objects(
+            eles,
+            library={},
+            use_real_model=True,
+            catalogue=str(catalogue),
+            prefetcher=prefetcher,
+        )
+        assert [len(ob.children) for ob in objects] == [1, 1, 1, 0]
+
+    # The index persists across sessions
+    prefetcher = ModelPrefetcher(str(catalogue), cache)
+    cube = prefetcher.objects("packed.blend")["cube"]
+    assert cube["vertices"] == 8
+    assert cube["size"] == [2.0, 1.0, 1.0]
+    assert prefetcher.objects("absent.blend") is None
+    prefetcher.close()
+
+
+def test_library_not_shared(tmp_path):
+    make_catalogue(tmp_path)
+    eles = [Element(name="E", L=1, descrip="3DMODEL=plain.blend")]
+    settings = dict(use_real_model=True, catalogue=str(tmp_path))
+    settings["prefetcher"] = ModelPrefetcher(str(tmp_path), str(tmp_path / "cache"))
+    for _ in range(2):
+        # A fresh scene frees the CAD objects of the previous build
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        (ob,) = lattice.ele_objects(eles, **settings)
+        assert len(ob.children) == 1
+    settings["prefetcher"].close()
+
+
+def test_warm_index(tmp_path, monkeypatch):
+    make_catalogue(tmp_path)
+    eles = [Element(name="E", L=1, descrip="3DMODEL=plain.blend")]
+    cache = str(tmp_path / "cache")
+    with ModelPrefetcher(str(tmp_path), cache) as prefetcher:
+        prefetcher.start(eles)
+
+    # Indexed models are not waited for by start, only by path
+    ready = threading.Event()
+    prepare = ModelPrefetcher._prepare
+    monkeypatch.setattr(
+        ModelPrefetcher,
+        "_prepare",
+        lambda self, path: ready.wait(10) and prepare(self, path),
+    )
+    with ModelPrefetcher(str(tmp_path), cache) as prefetcher:
+        assert prefetcher.start(eles) == ["plain.blend"]
+        assert not prefetcher.futures["plain.blend"].done()
+        assert prefetcher.objects("plain.blend") == {"cube": {}}
+        ready.set()
+        assert prefetcher.path("plain.blend") == str(tmp_path / "plain.blend")
+
+    # A changed model is listed again
+    os.utime(tmp_path / "plain.blend", ns=(0, 0))
+    with ModelPrefetcher(str(tmp_path), cache) as prefetcher:
+        index = prefetcher.index[prefetcher._key("plain.blend")]
+        del index["objects"]["cube"]
+        prefetcher.start(eles)
+        assert prefetcher.objects("plain.blend") == {"cube": {}}
+
+
+def max_z(ob):
+    co = np.empty(len(ob.data.vertices) * 3)
+    ob.data.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3)[:, 2].max()
+
+
+def test_cut_shared_models(tmp_path):
+    make_catalogue(tmp_path)
+    eles = [
+        Element(name=f"E{i}", index=i, L=2, z=3 * i, descrip="3DMODEL=plain.blend")
+        for i in range(3)
+    ]
+    library = {}
+    settings = dict(use_real_model=True, catalogue=str(tmp_path), library=library)
+    objects = lattice.ele_objects(eles, cutaway="half", **settings)
+    children = [child for ob in objects for child in ob.children]
+    assert len(children) == 3
+    # Every use of the model is cut, and shares one cut mesh
+    assert all(max_z(child) < 1e-6 for child in children)
+    assert len({child.data for child in children}) == 1
+    # The library keeps the whole model
+    (cube,) = library[str(tmp_path / "plain.blend")]
+    assert max_z(cube) == 0.5
+    objects = lattice.ele_objects(eles, **settings)
+    assert all(max_z(child) == 0.5 for ob in objects for child in ob.children)
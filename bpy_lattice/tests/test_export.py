@@ -0,0 +1,116 @@
+import dataclasses
+import json
+import os
+import struct
+
+import numpy as np
+
+from bpy_lattice import export, geometry, synthetic
+from bpy_lattice.elements import dedupe_elements
+
+LAYOUT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "examples", "bmad", "lat.layout_table"
+)
+
+
+def _read_glb(file):
+    with open(file, "rb") as f:
+        magic, version, length = struct.unpack("<III", f.read(12))
+        assert magic == 0x46546C67 and version == 2
+        assert length == os.path.getsize(file)
+        n, kind = struct.unpack("<II", f.read(8))
+        gltf = json.loads(f.read(n))
+        n, kind = struct.unpack("<II", f.read(8))
+        assert n == gltf["buffers"][0]["byteLength"]
+        return gltf, f.read(n)
+
+
+def test_write_gltf(tmp_path):
+    eles = export.read_layout_table(LAYOUT)
+    file = export.export_lattice(eles, str(tmp_path / "lat.glb"), cutaway="quarter")
+    gltf, binary = _read_glb(file)
+    # One node per element plus the root, repeated shapes share meshes
+    assert len(gltf["nodes"]) == len(eles) + 1
+    assert len(gltf["meshes"]) == 5
+    acc = gltf["accessors"][gltf["meshes"][0]["primitives"][0]["indices"]]
+    view = gltf["bufferViews"][acc["bufferView"]]
+    idx = np.frombuffer(binary, np.uint32, acc["count"], view["byteOffset"])
+    assert idx.max() < gltf["accessors"][acc["bufferView"] - 1]["count"]
+
+
+def test_write_obj_ply(tmp_path):
+    eles = export.read_layout_table(LAYOUT)
+    export.export_lattice(eles, str(tmp_path / "lat.obj"))
+    assert (tmp_path / "lat.mtl").exists()
+    lines = (tmp_path / "lat.obj").read_text().splitlines()
+    assert sum(line.startswith("o ") for line in lines) == len(eles)
+
+    export.export_lattice(eles, str(tmp_path / "lat.ply"))
+    with open(tmp_path / "lat.ply", "rb") as f:
+        assert f.read(3) == b"ply"
+
+
+def multipass(eles, n_passes):
+    """
+    Each element repeated as slaves NAME\\1, NAME\\2, ..., with roundoff
+    """
+    return [
+        dataclasses.replace(
+            ele,
+            name=f"{ele.name}\\{i + 1}",
+            x=ele.x + 1e-9 * i,
+            theta=ele.theta + 2 * np.pi * i,
+        )
+        for i in range(n_passes)
+        for ele in eles
+    ]
+
+
+def test_dedupe_multipass(tmp_path):
+    eles = synthetic.linac(20)
+    slaves = multipass(eles, 3)
+    merged = dedupe_elements(slaves)
+    assert [ele.name for ele in merged] == [ele.name for ele in eles]
+    assert {ele.passes for ele in merged} == {3}
+    assert slaves[0].passes == 1 and slaves[0].name.endswith("\\1")
+
+    # Pass counts round trip through the table, and are not merged again
+    file = synthetic.write_layout_table(merged, str(tmp_path / "lat.layout_table"))
+    table = export.read_layout_table(file)
+    assert [ele.passes for ele in table] == [3] * len(eles)
+    assert dedupe_elements(table + table[:1])[0].passes == 6
+
+    gltf, _ = _read_glb(export.export_lattice(slaves, str(tmp_path / "lat.glb")))
+    assert len(gltf["nodes"]) == len(eles) + 1
+    assert gltf["nodes"][0]["extras"] == {"passes": 3}
+
+
+def test_dedupe_tolerance():
+    from bpy_lattice.elements import Element
+
+    def passes(*eles):
+        return [ele.passes for ele in dedupe_elements(eles, tol=1e-6)]
+
+    # Either side of a multiple of tol
+    a = Element(name="Q\\1", key="QUADRUPOLE", L=1, x=1.0000005 - 1e-12, theta=np.pi)
+    b = dataclasses.replace(a, name="Q\\2", x=1.0000005 + 1e-12, theta=-np.pi)
+    assert passes(a, b) == [2]
+    assert passes(a, dataclasses.replace(b, x=1.000002)) == [1, 1]
+    assert passes(a, dataclasses.replace(b, psi=2e-6)) == [1, 1]
+    assert passes(a, dataclasses.replace(b, key="SEXTUPOLE")) == [1, 1]
+
+
+def test_element_matrices():
+    import bpy
+
+    from bpy_lattice.lattice import ele_objects
+
+    eles = export.read_layout_table(LAYOUT)[:3]
+    for ele in eles:
+        ele.phi, ele.psi = 0.1, -0.2
+    objects = ele_objects(eles, origin=(1, 2, 3))
+    bpy.context.view_layer.update()
+    matrices = geometry.ele_matrices(eles, origin=(1, 2, 3))
+    for ob, ele, m in zip(objects, eles, matrices):
+        assert np.allclose(np.array(ob.matrix_world), m, atol=1e-6)
+        assert np.allclose(ob.rotation_euler[:], (ele.psi, -ele.phi, ele.theta))
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+
+def _imports_bpy(module):
+    code = f"import sys, {module}; print('bpy' in sys.modules)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return out.stdout.strip() == "True"
+
+
+def test_import_without_bpy():
+    for module in (
+        "bpy_lattice",
+        "bpy_lattice.elements",
+        "bpy_lattice.interfaces.bmad",
+    ):
+        assert not _imports_bpy(module), module
+
+
+def test_no_import_side_effects():
+    import bpy
+
+    from bpy_lattice import materials
+
+    assert "light" not in bpy.data.materials
+    assert materials.LIGHT_MATERIAL.name == "light"
+    assert materials.light_material() == materials.LIGHT_MATERIAL
@@ -1,8 +1,138 @@
-from bpy_lattice.lattice import ele_object
+import bpy
+import numpy as np
+import pytest
+
+from bpy_lattice import lattice
+from bpy_lattice.geometry import ele_matrices, faces_from, strip_topology
+from bpy_lattice.lattice import ele_mesh, ele_object, ele_objects, ele_section
 from bpy_lattice.elements import Element, SBend, Pipe, Wiggler
+from bpy_lattice.style import DEFAULT_STYLE
 
 
 def test_ele_object():
     for ele in (Element(), SBend(), Pipe(), Wiggler()):
         ele = Element()
         ele_object(ele, None)
+
+
+def test_cutaway_sections():
+    eles = (
+        Element(key="QUADRUPOLE", L=1),
+        SBend(key="SBEND", L=1, angle=0.3),
+        Pipe(key="PIPE", L=1, radius_x=0.01, radius_y=0.02, thickness=0.002),
+    )
+    for ele in eles:
+        for s in (-0.5, 0.5):
+            half = ele_section(s, ele, cutaway="half")
+            assert max(p[2] for p in half) < 1e-9
+            if isinstance(ele, SBend):
+                continue  # sections are rotated along the arc
+            quarter = ele_section(s, ele, cutaway="quarter")
+            assert not any(p[1] < -1e-9 and p[2] > 1e-9 for p in quarter)
+        assert len(ele_mesh(ele, cutaway="quarter").vertices) > 0
+
+
+def test_mesh_normals_outward():
+    eles = (
+        Element(key="QUADRUPOLE", L=1),
+        Element(key="DRIFT", L=1),
+        Pipe(key="PIPE", L=1, radius_x=0.02, radius_y=0.03, thickness=0.002),
+        SBend(key="SBEND", L=1, angle=0.3, e1=0.1),
+    )
+    for ele in eles:
+        for cutaway in (None, "quarter", "half"):
+            mesh = ele_mesh(ele, cutaway=cutaway)
+            # No repeated points in any section
+            co = {tuple(round(c, 9) for c in v.co) for v in mesh.vertices}
+            assert len(co) == len(mesh.vertices)
+            # Signed volume is positive for outward normals
+            volume = 0
+            for poly in mesh.polygons:
+                v = [mesh.vertices[i].co for i in poly.vertices]
+                for k in range(1, len(v) - 1):
+                    volume += v[0].dot(v[k].cross(v[k + 1])) / 6
+            assert volume > 0
+
+
+def test_mesh_smooth_normals():
+    style = DEFAULT_STYLE.replace(smooth=True)
+    mesh = ele_mesh(Element(key="DRIFT", L=1), style=style)
+    assert all(p.use_smooth for p in mesh.polygons)
+    normals = np.array([n.vector for n in mesh.corner_normals])
+    co = np.array([mesh.vertices[loop.vertex_index].co for loop in mesh.loops])
+    caps = np.abs(normals[:, 0]) > 0.5
+    # Sides are smooth and radial, caps are flat along the axis
+    radial = co[~caps, 1:] / np.linalg.norm(co[~caps, 1:], axis=1, keepdims=True)
+    np.testing.assert_allclose(normals[~caps, 1:], radial, atol=1e-4)
+    np.testing.assert_allclose(np.abs(normals[caps, 0]), 1, atol=1e-6)
+
+
+def test_strip_topology():
+    loop_vertices, loop_totals = strip_topology(3, 4)
+    assert strip_topology(3, 4)[0] is loop_vertices  # cached
+    assert not loop_vertices.flags.writeable
+    assert list(loop_totals) == [4] * 8 + [4, 4]
+    assert loop_totals.sum() == len(loop_vertices)
+    # Every edge is shared by exactly two faces, in opposite directions
+    faces = faces_from([[(0, 0, 0)] * 4] * 3)
+    edges = [(f[k], f[(k + 1) % len(f)]) for f in faces for k in range(len(f))]
+    assert len(set(edges)) == len(edges)
+    assert {(b, a) for a, b in edges} == set(edges)
+
+
+def test_bulk_objects():
+    eles = [
+        Element(name=f"Q{i}", key="QUADRUPOLE", L=1, z=2 * i, theta=0.1 * i)
+        for i in range(3)
+    ] + [SBend(name="B", key="SBEND", L=1, angle=0.1)]
+    objects = ele_objects(eles, bulk=True, collection_name="bulk_test")
+    root = bpy.data.collections["bulk_test"]
+    assert root.name in bpy.context.collection.children
+    assert sorted(c.name for c in root.children) == [
+        "bulk_test_QUADRUPOLE",
+        "bulk_test_SBEND",
+    ]
+    assert len(root.children["bulk_test_QUADRUPOLE"].objects) == 3
+    view_layer_objects = bpy.context.view_layer.objects
+    for ob, m in zip(objects, ele_matrices(eles)):
+        assert ob.name in view_layer_objects
+        np.testing.assert_allclose(np.array(ob.matrix_world), m, atol=1e-6)
+
+
+def test_multipass_objects():
+    eles = [Element(name=f"Q1\\{i}", key="QUADRUPOLE", L=1, z=2) for i in (1, 2)] + [
+        Element(name="Q2", key="QUADRUPOLE", L=1, z=2)
+    ]
+    objects = ele_objects(eles)
+    assert [ob.get("passes") for ob in objects] == [2, None]
+    assert objects[0].name.startswith("Q1")
+    assert len(ele_objects(eles, dedupe=False)) == 3
+
+
+def test_removed_settings():
+    with pytest.raises(AttributeError, match="Style"):
+        lattice.ELE_X_SCALE["LCAVITY"] = 0.1
+    with pytest.raises(AttributeError, match="scale_factor"):
+        lattice.ELE_X_SCALE_FACTOR
+
+
+def test_style_materials():
+    ele = Element(name="Q", key="QUADRUPOLE", L=1)
+    style = DEFAULT_STYLE.replace(colors={"QUADRUPOLE": (1, 0.5, 0)})
+    default = lattice.ele_material(ele)
+    other = lattice.ele_material(ele, style)
+    assert default.name == "QUADRUPOLE_material"
+    assert other.name == "QUADRUPOLE_material_ff8000"
+    (ob,) = ele_objects([ele], style=style)
+    assert ob.active_material == other
+    assert tuple(other.diffuse_color)[:3] == (1, 0.5, 0)
+
+
+def test_orbit_mesh_resolution():
+    from bpy_lattice.orbit import orbit_mesh
+
+    coords = [[0, 1, 0, 0, s, 0, 0, 1e8, s, 1, 0, 1, 0] for s in range(4)]
+    for n in (8, 16, 30):
+        mesh = orbit_mesh(coords, f"orbit_{n}", n=n)
+        assert len(mesh.vertices) == 4 * n
+        assert not mesh.validate()  # Nothing to fix
@@ -0,0 +1,24 @@
+import json
+import os
+
+from bpy_lattice import lattice, profiling
+
+LAYOUT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "examples", "bmad", "lat.layout_table"
+)
+
+
+def test_build_stats(tmp_path):
+    json_file = tmp_path / "build.json"
+    with profiling.build("lat", json_file=str(json_file)) as stats:
+        eles = lattice.import_lattice(LAYOUT)
+        lattice.ele_objects(eles)
+    summary = json.loads(json_file.read_text())
+    assert summary["name"] == "lat"
+    assert summary["counters"]["elements"] == 8
+    assert summary["counters"]["objects"] == stats.counters["meshes"]
+    for name in ("parse", "section", "mesh", "link", "material"):
+        assert summary["stages"][name]["calls"] > 0
+    # Nothing is recorded outside a build
+    profiling.count("elements")
+    assert stats.counters["elements"] == 8
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from bpy_lattice import render
+
+LAYOUT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "examples", "bmad", "lat.layout_table"
+)
+
+
+def test_parse_view():
+    name, view = render.parse_view("top:scale=40")
+    assert name == "top"
+    assert view == {"type": "ortho", "z": 10, "scale": 40.0}
+    name, view = render.parse_view("fit-top:names=Q*,start=3")
+    assert view == {
+        "type": "fit",
+        "view": "top",
+        "oriented": True,
+        "names": "Q*",
+        "start": 3.0,
+    }
+    with pytest.raises(ValueError):
+        render.parse_view("nope")
+
+
+def test_render_entrypoint(tmp_path):
+    render.render_entrypoint(
+        [
+            LAYOUT,
+            "--view",
+            "top",
+            "--view",
+            "perspective:d=10",
+            "--view",
+            "fit",
+            "--output-dir",
+            str(tmp_path),
+            "--resolution",
+            "32",
+            "24",
+            "--samples",
+            "1",
+        ]
+    )
+    assert (tmp_path / "lat_top.png").exists()
+    assert (tmp_path / "lat_perspective.png").exists()
+    assert (tmp_path / "lat_fit.png").exists()
@@ -0,0 +1,54 @@
+import bpy
+
+from bpy_lattice import slicer
+from bpy_lattice.lattice import ele_objects
+from bpy_lattice.elements import Element
+
+
+def _clear():
+    for o in list(bpy.data.objects):
+        bpy.data.objects.remove(o)
+
+
+def test_objects_intersecting():
+    _clear()
+    eles = [
+        Element(name="Q1", key="QUADRUPOLE", L=1, z=0),
+        Element(name="Q2", key="QUADRUPOLE", L=1, z=100),
+    ]
+    objects = ele_objects(eles)
+    punch = slicer.cube_slicer(location=(0, 0, 1))
+    hits = slicer.objects_intersecting(objects, punch)
+    assert [o.name for o in hits] == ["Q1"]
+
+
+def test_slice_objects_join():
+    _clear()
+    eles = [Element(name=f"Q{i}", key="QUADRUPOLE", L=1, z=2 * i) for i in range(3)]
+    objects = ele_objects(eles)
+    nverts = sum(len(o.data.vertices) for o in objects)
+    punch = slicer.cutaway_punch(objects, z=0)
+    sliced = slicer.slice_objects(objects, punch, join=True)
+    assert len(sliced) == 1
+    assert sliced[0].name == "QUADRUPOLE_material_joined"
+    zmax = max(v.co.z for v in sliced[0].data.vertices)
+    assert zmax < 1e-6
+    assert 0 < len(sliced[0].data.vertices) < 2 * nverts
+
+
+def test_join_keeps_children():
+    _clear()
+    eles = [Element(name=f"Q{i}", key="QUADRUPOLE", L=1, z=2 * i) for i in range(2)]
+    objects = ele_objects(eles)
+    bpy.context.view_layer.update()
+    child = bpy.data.objects.new("child", None)
+    bpy.context.collection.objects.link(child)
+    child.parent = objects[1]
+    child.location = (0, 0, 0.5)
+    bpy.context.view_layer.update()
+    world = child.matrix_world.copy()
+
+    slicer.join_by_material(objects)
+    bpy.context.view_layer.update()
+    assert child.parent is None
+    assert (child.matrix_world.translation - world.translation).length < 1e-6
@@ -0,0 +1,49 @@
+import logging
+
+import numpy as np
+import pytest
+
+from bpy_lattice.elements import Element
+from bpy_lattice.export import write_obj
+from bpy_lattice.style import DEFAULT_STYLE, Style
+
+
+def test_style_replace():
+    style = DEFAULT_STYLE.replace(scale_factor=3, x_scale={"lcavity": 0.2})
+    assert style.lookup("LCAVITY").scale == pytest.approx(0.6)
+    assert style.lookup("QUADRUPOLE").scale == pytest.approx(0.09)
+    assert style == Style(scale_factor=3).replace(x_scale={"LCAVITY": 0.2})
+    assert style.cache_key() != DEFAULT_STYLE.cache_key()
+    with pytest.raises(ValueError):
+        Style(scale_factor=-1)
+    with pytest.raises(ValueError):
+        DEFAULT_STYLE.replace(colors={"SBEND": (2, 0, 0)})
+    with pytest.raises(ValueError):
+        DEFAULT_STYLE.replace(sections={"SBEND": "triangle"})
+
+
+def test_style_table(caplog):
+    style = DEFAULT_STYLE.replace(scale_factor=2)
+    eles = [Element(key=k, L=1) for k in ("QUADRUPOLE", "FOO", "FOO", "DRIFT")]
+    with caplog.at_level(logging.WARNING):
+        table = style.resolve(ele.key for ele in eles)
+        style.resolve(["FOO"])
+    assert caplog.text.count("missing FOO") == 1
+    idx = table.indices(eles)
+    np.testing.assert_allclose(table.scale[idx], [0.06, 2, 2, 0.02])
+    assert table.color.shape == (3, 3)
+    assert table.section[idx[0]] == "quadrupole"
+
+
+def test_style_export(tmp_path):
+    ele = Element(name="Q", key="QUADRUPOLE", L=1)
+    big = DEFAULT_STYLE.replace(scale_factor=100, sections={"QUADRUPOLE": "box"})
+    # Octagon (cos(pi / 8) half-width) or box
+    for style, n_verts, width in ((DEFAULT_STYLE, 16, np.cos(np.pi / 8)), (big, 8, 1)):
+        file = tmp_path / "lat.obj"
+        write_obj([ele], str(file), style=style, y_up=False)
+        lines = file.read_text().split("\n")
+        verts = np.array([v.split()[1:] for v in lines if v[:2] == "v "], dtype=float)
+        assert len(verts) == n_verts
+        sc = style.lookup("QUADRUPOLE").scale
+        assert verts[:, 1].max() == pytest.approx(width * sc, 1e-5)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from bpy_lattice import synthetic
+from bpy_lattice.export import read_layout_table
+from bpy_lattice.lattice import blendfile
+from bpy_lattice.orbit import import_orbit
+
+
+def test_fodo_ring(tmp_path):
+    eles = synthetic.fodo_ring(80, model_every=4)
+    assert len(eles) == 80
+    # The ring closes: the last drift ends where the first quad begins
+    last = eles[-1]
+    assert np.hypot(last.x, last.z + last.L / 2) < 1e-9
+    assert last.theta == pytest.approx(-2 * np.pi)
+    assert sum(blendfile(ele) is not None for ele in eles) == 5
+
+    file = tmp_path / "ring.layout_table"
+    synthetic.write_layout_table(eles, str(file))
+    read = read_layout_table(str(file))
+    assert [type(ele) for ele in read] == [type(ele) for ele in eles]
+    for a, b in zip(read, eles):
+        assert a.name == b.name and a.descrip == b.descrip
+        assert (a.x, a.z, a.theta) == pytest.approx((b.x, b.z, b.theta), abs=1e-7)
+
+
+def test_orbit(tmp_path):
+    eles = synthetic.linac(40, dogleg_every=2)
+    file = tmp_path / "orbit.dat"
+    synthetic.write_orbit(eles, str(file), points_per_element=3)
+    orbit = import_orbit(str(file))
+    assert len(orbit) == 3 * (len(eles) - 1) + 1
+    assert len(orbit[0]) == 13
+    # Blender (x, y) of the orbit follows the element (z, x)
+    y, _, _, _, x = orbit[-1][:5]
+    assert (x, y) == pytest.approx((eles[-1].z, eles[-1].x), abs=2e-3)
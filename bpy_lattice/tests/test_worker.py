@@ -0,0 +1,49 @@
+import json
+import os
+
+import bpy
+
+from bpy_lattice import worker
+
+LAYOUT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "examples", "bmad", "lat.layout_table"
+)
+
+
+def test_run_worker(tmp_path):
+    for i in range(2):
+        job = {
+            "layout_file": LAYOUT,
+            "views": ["top"],
+            "output_dir": str(tmp_path / f"out{i}"),
+            "resolution": [16, 16],
+            "samples": 1,
+        }
+        with open(tmp_path / f"job{i}.json", "w") as f:
+            json.dump(job, f)
+    (tmp_path / "bad.json").write_text("{}")
+
+    assert worker.run_worker(str(tmp_path), exit_when_idle=True) == 3
+    assert (tmp_path / "out0" / "lat_top.png").exists()
+    assert (tmp_path / "out1" / "lat_top.png").exists()
+    assert (tmp_path / "job1.done").exists()
+    assert (tmp_path / "bad.failed").exists()
+    # Materials are reused, not duplicated
+    assert "SBEND_material.001" not in bpy.data.materials
+    assert "B1.001" not in bpy.data.objects
+
+
+def test_claim_job_race(tmp_path, monkeypatch):
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.json").write_text("{}")
+    getmtime = os.path.getmtime
+
+    def claimed_by_other(path):
+        # Another worker claims a.json between the glob and the sort
+        if path.endswith("a.json"):
+            os.rename(path, path[: -len(".json")] + ".running")
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, "getmtime", claimed_by_other)
+    assert worker.claim_job(str(tmp_path)) == str(tmp_path / "b.running")
+    assert worker.claim_job(str(tmp_path)) is None
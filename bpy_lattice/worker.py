@@ -0,0 +1,173 @@
+"""
+Long-lived render worker that keeps one warm Blender session.
+
+Jobs are JSON files dropped into a job directory:
+
+    {"layout_file": "lat.layout_table", "views": ["top"], "output_dir": "renders"}
+
+Any other keys are passed to render.render_layout (for example `resolution`,
+`samples`, `catalogue`, `cutaway`). The worker claims a job by renaming it to
+`<name>.running`, and when finished writes `<name>.done` (the list of outputs)
+or `<name>.failed` (the error) next to it.
+
+Producers must write a job under another name (e.g. `<name>.json.tmp`) and
+then rename it to `<name>.json`, so that a worker never reads a half-written
+job. Several workers can share a job directory: each job is claimed by one.
+
+Between jobs only the lattice objects are removed. Materials and CAD objects
+loaded from 3DMODEL .blend files stay in memory and are reused by later jobs.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+import traceback
+from typing import Dict, Optional
+
+import bpy
+
+from bpy_lattice import lattice, render
+
+# Objects created by render.reset_scene that are kept between jobs
+KEEP_OBJECTS = ("Camera", "Sun")
+
+logger = logging.getLogger(__name__)
+
+
+def clear_scene(library: Dict):
+    """
+    Remove lattice objects, their meshes and bulk build collections, keeping
+    the camera, lights, materials and the CAD objects cached in `library`.
+    """
+    cached = {o for objs in library.values() for o in objs}
+    for o in list(bpy.data.objects):
+        if o.name in KEEP_OBJECTS or o in cached:
+            continue
+        bpy.data.objects.remove(o)
+    for coll in list(bpy.data.collections):
+        if coll.get(lattice.BUILD_TAG):
+            bpy.data.collections.remove(coll)
+    for mesh in list(bpy.data.meshes):
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+
+def claim_job(job_dir: str) -> Optional[str]:
+    """
+    Claim the oldest job in job_dir by renaming it. Returns the claimed path.
+    """
+    jobs = []
+    for job in glob.glob(os.path.join(job_dir, "*.json")):
+        try:
+            jobs.append((os.path.getmtime(job), job))
+        except OSError:
+            continue  # Claimed by another worker since the glob
+    for _, job in sorted(jobs):
+        running = job[: -len(".json")] + ".running"
+        try:
+            os.rename(job, running)
+        except OSError:
+            continue  # Claimed by another worker
+        return running
+    return None
+
+
+def run_job(path: str, library: Dict) -> list:
+    """
+    Run one claimed job file and return its outputs.
+    """
+    with open(path) as f:
+        job = json.load(f)
+    layout_file = job.pop("layout_file")
+    views = job.pop("views", ["perspective"])
+    if "resolution" in job:
+        job["resolution"] = tuple(job["resolution"])
+    clear_scene(library)
+    return render.render_layout(layout_file, views, reset=False, library=library, **job)
+
+
+def run_worker(
+    job_dir: str,
+    poll: float = 1.0,
+    max_jobs: Optional[int] = None,
+    exit_when_idle: bool = False,
+):
+    """
+    Process jobs from job_dir in one Blender session.
+
+    Parameters
+    ----------
+    job_dir: str
+        Directory to watch for *.json job files
+    poll: float
+        Seconds between directory scans when idle
+    max_jobs: int, optional
+        Stop after this many jobs
+    exit_when_idle: bool
+        Stop when no job is waiting instead of polling
+
+    Returns
+    -------
+    n_jobs: int
+        Number of jobs processed
+    """
+    library = {}
+    render.reset_scene()
+    n_jobs = 0
+    while max_jobs is None or n_jobs < max_jobs:
+        path = claim_job(job_dir)
+        if path is None:
+            if exit_when_idle:
+                break
+            time.sleep(poll)
+            continue
+        base = path[: -len(".running")]
+        t0 = time.perf_counter()
+        try:
+            outputs = run_job(path, library)
+        except Exception:
+            with open(base + ".failed", "w") as f:
+                f.write(traceback.format_exc())
+            logger.error("Job failed: %s", base)
+        else:
+            with open(base + ".done", "w") as f:
+                json.dump({"outputs": outputs}, f, indent=1)
+            logger.info("Job done: %s (%.2f s)", base, time.perf_counter() - t0)
+        os.remove(path)
+        n_jobs += 1
+    return n_jobs
+
+
+def worker_entrypoint(argv=None):
+    """
+    Entry point for the persistent render worker.
+    """
+    parser = argparse.ArgumentParser(
+        description="Render lattice jobs from a job directory in one Blender session."
+    )
+    parser.add_argument("job_dir", help="Directory to watch for *.json jobs")
+    parser.add_argument("--poll", type=float, default=1.0, help="Poll interval (s)")
+    parser.add_argument("--max-jobs", type=int, default=None)
+    parser.add_argument(
+        "--exit-when-idle", action="store_true", help="Exit when the queue is empty"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Enable verbose logging")
+    args = parser.parse_args(render.script_args(argv))
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    os.makedirs(args.job_dir, exist_ok=True)
+    run_worker(
+        args.job_dir,
+        poll=args.poll,
+        max_jobs=args.max_jobs,
+        exit_when_idle=args.exit_when_idle,
+    )
+
+
+if __name__ == "__main__":
+    worker_entrypoint()
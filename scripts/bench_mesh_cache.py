@@ -0,0 +1,103 @@
+"""
+Benchmark of cache.MeshCache against generating the mesh arrays.
+
+For a synthetic lattice (see bpy_lattice.synthetic), times the mesh arrays
+of every drawn element:
+
+    generate  geometry.ele_arrays for each element
+    cold      MeshCache.mesh_arrays with an empty cache, and save
+    warm      MeshCache.mesh_arrays in a new session, reading the saved bundle
+
+Usage:
+    python scripts/bench_mesh_cache.py --sizes 1000 10000 --cutaway half
+"""
+
+import argparse
+import tempfile
+import time
+
+from bpy_lattice import geometry, synthetic
+from bpy_lattice.cache import MeshCache
+from bpy_lattice.style import DEFAULT_STYLE
+
+LATTICES = {
+    "ring": synthetic.fodo_ring,
+    "linac": synthetic.linac,
+}
+
+
+def element_styles(eles, style=DEFAULT_STYLE):
+    """
+    (ele, sc, section) of each drawn element
+    """
+    drawn = list(geometry.drawn_elements(eles))
+    table = style.resolve(ele.key for ele in drawn)
+    return [
+        (ele, table.rows[row][0], table.rows[row][2])
+        for ele, row in zip(drawn, table.indices(drawn))
+    ]
+
+
+def generate(items, cutaway=None):
+    for ele, sc, section in items:
+        geometry.ele_arrays(ele, sc, cutaway=cutaway, section=section)
+
+
+def cached(items, directory, cutaway=None):
+    cache = MeshCache(directory)
+    for ele, sc, section in items:
+        cache.mesh_arrays(ele, sc, cutaway=cutaway, section=section)
+    cache.save()
+    return cache
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    out = func(*args)
+    return time.perf_counter() - t0, out
+
+
+def run(sizes, lattice="ring", cutaway=None):
+    """
+    Returns
+    -------
+    rows: list of dict
+        One per size with n_elements, entries, and the time of each stage
+    """
+    rows = []
+    for n in sizes:
+        items = element_styles(LATTICES[lattice](n))
+        with tempfile.TemporaryDirectory() as tmp:
+            t_generate, _ = timed(generate, items, cutaway)
+            t_cold, cache = timed(cached, items, tmp, cutaway)
+            t_warm, _ = timed(cached, items, tmp, cutaway)
+        row = {
+            "n_elements": len(items),
+            "entries": len(cache.entries),
+            "generate": t_generate,
+            "cold": t_cold,
+            "warm": t_warm,
+        }
+        rows.append(row)
+        print(
+            f"{row['n_elements']:>9d} {row['entries']:>8d} {t_generate:10.3f} s"
+            f" {t_cold:10.3f} s {t_warm:10.3f} s {t_generate / t_warm:8.1f}x"
+        )
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesh cache benchmark.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--lattice", choices=list(LATTICES), default="ring")
+    parser.add_argument("--cutaway", choices=list(geometry.CUTAWAY_WEDGE), default=None)
+    args = parser.parse_args(argv)
+    print(
+        f"{'elements':>9s} {'entries':>8s} {'generate':>12s} {'cold':>12s}"
+        f" {'warm':>12s} {'speedup':>9s}"
+    )
+    run(args.sizes, lattice=args.lattice, cutaway=args.cutaway)
+
+
+if __name__ == "__main__":
+    main()
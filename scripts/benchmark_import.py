@@ -0,0 +1,52 @@
+"""
+Import-time benchmark for bpy_lattice modules.
+
+Each module is imported in a fresh interpreter. Reports the wall time
+and whether bpy was pulled in.
+
+Usage:
+    python scripts/benchmark_import.py [module ...]
+"""
+
+import subprocess
+import sys
+
+MODULES = (
+    "bpy_lattice",
+    "bpy_lattice.elements",
+    "bpy_lattice.interfaces.bmad",
+    "bpy_lattice.lattice",
+)
+
+CODE = """
+import sys, time
+t0 = time.perf_counter()
+import {module}
+dt = time.perf_counter() - t0
+print(dt, 'bpy' in sys.modules)
+"""
+
+
+def time_import(module, repeat=3):
+    """
+    Best-of-repeat import time in seconds, and whether bpy was imported.
+    """
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", CODE.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        dt, uses_bpy = float(out[0]), out[1] == "True"
+        best = dt if best is None else min(best, dt)
+    return best, uses_bpy
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or MODULES
+    print(f"{'module':32s} {'time (ms)':>10s}  imports bpy")
+    for module in modules:
+        dt, uses_bpy = time_import(module)
+        print(f"{module:32s} {1000 * dt:10.1f}  {uses_bpy}")
@@ -1,7 +1,7 @@
 # bpy_lattice make_lattice script
 #
 from bpy_lattice import lattice, slicer
-from mathutils import Vector
+from bpy_lattice.style import Style
 
 
 # For development
@@ -11,11 +11,9 @@ imp.reload(lattice)
 
 
 FILE = "lat.layout_table"
-# Change the overall scale factor for drawing elements
-lattice.ELE_X_SCALE_FACTOR = 3
-
-# Change a particular type of element scale
-lattice.ELE_X_SCALE["LCAVITY"] = 0.1
+# Change the overall scale factor for drawing elements,
+# and a particular type of element scale
+STYLE = Style().replace(scale_factor=3, x_scale={"LCAVITY": 0.1})
 
 # Basic settings
 SETTINGS = {
@@ -23,6 +21,7 @@ SETTINGS = {
     "catalogue": None,
     "hide_real_model": True,
     "origin": (0, 0, 0),
+    "style": STYLE,
 }
 
 
@@ -35,15 +34,13 @@ objects = lattice.ele_objects(eles, **SETTINGS)
 
 
 # Optional: Slice
-# slicer_object = slicer.cube_slicer()
-slicer_object = None
-
-if slicer_object:
-    print("slicing with ")
-    for ob in objects:
-        slicer_object.location = ob.location + Vector((0, 0, 1))
-        print(ob, ob.children)
-        for c in ob.children:
-            print("slicing child")
-            slicer.slice_object(c, slicer_object, use_ops_method=True)
-        slicer.slice_object(ob, slicer_object, use_ops_method=True)
+# Cut everything above the beamline with one stationary punch.
+# Only objects overlapping the punch are cut. Set join=True to
+# cut one joined mesh per material in a single boolean pass.
+SLICE = False
+
+if SLICE:
+    targets = objects + [c for ob in objects for c in ob.children]
+    slicer_object = slicer.cutaway_punch(targets, z=0)
+    slicer.slice_objects(targets, slicer_object, join=False)
+    slicer_object.hide_set(True)
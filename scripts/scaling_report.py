@@ -0,0 +1,204 @@
+"""
+Scaling report for the lattice build pipeline.
+
+Synthesizes lattices of increasing size (see bpy_lattice.synthetic), and
+times each stage, and the peak Python memory allocated in it (tracemalloc,
+which does not see Blender's own allocations):
+
+    import  parsing the .layout_table
+    mesh    generating the mesh arrays of every element
+    build   creating the Blender objects (needs bpy, limited by --max-build)
+
+Stages whose time grows faster than linearly between sizes are flagged,
+from the log-log slope of time against element count.
+
+Usage:
+    python scripts/scaling_report.py --max 1000000 --json scaling.json
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from math import log
+
+from bpy_lattice import geometry, synthetic
+from bpy_lattice.export import read_layout_table
+from bpy_lattice.style import DEFAULT_STYLE
+
+# Slope above which a stage is flagged as super-linear
+SLOPE_LIMIT = 1.2
+
+# Stages faster than this are too noisy to flag
+MIN_TIME = 0.05
+
+LATTICES = {
+    "ring": synthetic.fodo_ring,
+    "linac": synthetic.linac,
+}
+
+
+def measure(func, *args, memory=True):
+    """
+    Time func, then (since tracing slows Python down) run it again under
+    tracemalloc for its peak Python allocation.
+
+    Returns
+    -------
+    seconds, peak_bytes (None without memory)
+    """
+    t0 = time.perf_counter()
+    func(*args)
+    dt = time.perf_counter() - t0
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return dt, peak
+
+
+def mesh_arrays(eles, style=DEFAULT_STYLE):
+    drawn = list(geometry.drawn_elements(eles))
+    table = style.resolve(ele.key for ele in drawn)
+    n_verts = 0
+    for ele, row in zip(drawn, table.indices(drawn)):
+        sc, _, section = table.rows[row]
+        verts, _, _ = geometry.ele_arrays(ele, sc, section=section)
+        n_verts += len(verts)
+    return n_verts
+
+
+def build_objects(eles, bulk=True):
+    import bpy
+
+    from bpy_lattice import lattice
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    objects = lattice.ele_objects(eles, bulk=bulk)
+    bpy.context.view_layer.update()
+    return len(objects)
+
+
+def run(sizes, lattice="ring", max_build=10_000, bulk=True, memory=True):
+    """
+    Measure each stage at each size.
+
+    Returns
+    -------
+    rows: list of dict
+        One per (size, stage) with n_elements, stage, time, peak_bytes
+    """
+    try:
+        import bpy  # noqa: F401
+
+        has_bpy = True
+    except ImportError:
+        has_bpy = False
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            eles = LATTICES[lattice](n, model_every=10)
+            file = os.path.join(tmp, f"{lattice}_{n}.layout_table")
+            synthetic.write_layout_table(eles, file)
+            n = len(eles)
+
+            stages = [
+                ("import", read_layout_table, (file,)),
+                ("mesh", mesh_arrays, (eles,)),
+            ]
+            if has_bpy and n <= max_build:
+                stages.append(("build", build_objects, (eles, bulk)))
+            for stage, func, args in stages:
+                dt, peak = measure(func, *args, memory=memory)
+                rows.append(
+                    {"n_elements": n, "stage": stage, "time": dt, "peak_bytes": peak}
+                )
+                mib = f"{peak / 2**20:10.1f} MiB" if peak is not None else ""
+                print(f"{n:>9d} {stage:8s} {dt:10.3f} s {mib}")
+    return rows
+
+
+def slopes(rows):
+    """
+    Log-log slope of time against n_elements between successive sizes,
+    as (stage, n0, n1, slope, flagged)
+    """
+    out = []
+    for stage in dict.fromkeys(r["stage"] for r in rows):
+        pts = [(r["n_elements"], r["time"]) for r in rows if r["stage"] == stage]
+        for (n0, t0), (n1, t1) in zip(pts, pts[1:]):
+            if n1 == n0 or t0 <= 0:
+                continue
+            slope = log(t1 / t0) / log(n1 / n0)
+            flagged = slope > SLOPE_LIMIT and t1 > MIN_TIME
+            out.append((stage, n0, n1, slope, flagged))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling report of the build.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Element counts (default: powers of 10 from 100 to --max)",
+    )
+    parser.add_argument("--max", type=int, default=100_000, help="Largest size")
+    parser.add_argument("--lattice", choices=list(LATTICES), default="ring")
+    parser.add_argument(
+        "--max-build",
+        type=int,
+        default=10_000,
+        help="Largest size for the Blender object build",
+    )
+    parser.add_argument(
+        "--no-bulk", action="store_true", help="Link objects one at a time"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip the tracemalloc runs"
+    )
+    parser.add_argument("--json", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes
+    if sizes is None:
+        sizes = []
+        n = 100
+        while n <= args.max:
+            sizes.append(n)
+            n *= 10
+
+    print(f"{'elements':>9s} {'stage':8s} {'time':>12s} {'peak memory':>14s}")
+    rows = run(
+        sizes,
+        lattice=args.lattice,
+        max_build=args.max_build,
+        bulk=not args.no_bulk,
+        memory=not args.no_memory,
+    )
+
+    print("\nLog-log slopes of time (1 = linear):")
+    report = []
+    for stage, n0, n1, slope, flagged in slopes(rows):
+        mark = "  SUPER-LINEAR" if flagged else ""
+        print(f"  {stage:8s} {n0:>9d} -> {n1:<9d} {slope:5.2f}{mark}")
+        report.append(
+            {"stage": stage, "n0": n0, "n1": n1, "slope": slope, "flagged": flagged}
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rows": rows, "slopes": report}, f, indent=1)
+        print("Wrote: ", args.json)
+
+
+if __name__ == "__main__":
+    main()